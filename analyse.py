@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        analyse.py
+#? Purpose:     Batch position analysis: multi-PV engine evaluation of FEN/EPD files
+#?              across several engine processes, streamed out as NDJSON
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import argparse
+import json
+import sys
+import time
+import chess.engine
+from chess_core import ChessEngine, shutdown_engines
+#? -------------------------------------------------------------------------------
+def read_positions(lines):
+    # One FEN or EPD record per line; EPD operations after the four position fields are
+    # dropped. Blank lines and lines starting with # are skipped.
+    for line in lines:
+        fields = line.split(';')[0].split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+            yield ' '.join(fields[:6])
+        else:
+            yield ' '.join(fields[:4])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse a file of positions with the engine and write NDJSON.")
+    parser.add_argument("positions", nargs="?", default="-", help="FEN/EPD file, one per line ('-' for stdin)")
+    parser.add_argument("-o", "--out", help="write results here instead of stdout")
+    parser.add_argument("--depth", type=int, help="search depth per position")
+    parser.add_argument("--nodes", type=int, help="node limit per position")
+    parser.add_argument("--time", type=float, help="seconds per position (default 1.0 if no other limit)")
+    parser.add_argument("--multipv", type=int, default=1, help="number of lines per position (default 1)")
+    parser.add_argument("--processes", type=int, default=1, help="engine processes (default 1)")
+    parser.add_argument("--threads", type=int, help="UCI Threads option for each engine")
+    parser.add_argument("--hash", type=int, help="UCI Hash option (MB) for each engine")
+    parser.add_argument("--engine", help="path to the UCI engine (default: bundled Stockfish)")
+    args = parser.parse_args(argv)
+
+    limit = chess.engine.Limit(depth=args.depth, nodes=args.nodes, time=args.time)
+    if args.depth is None and args.nodes is None and args.time is None:
+        limit.time = 1.0
+
+    stream = sys.stdin if args.positions == "-" else open(args.positions, encoding="utf-8")
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    count = errors = 0
+    start = time.perf_counter()
+    try:
+        results = ChessEngine(args.engine).analyse_batch(
+            read_positions(stream), limit, multipv=args.multipv, processes=args.processes,
+            threads=args.threads, hash_mb=args.hash)
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            count += 1
+            errors += 'error' in result
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if out is not sys.stdout:
+            out.close()
+        shutdown_engines()
+    seconds = max(time.perf_counter() - start, 1e-9)
+    print(f"{count} positions ({errors} errors) in {seconds:.1f} s, {count / seconds:.2f} positions/s",
+          file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1341 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        chess_core.py
+#? Purpose:     Chess rules, game state and engine access, importable without a display
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Based on:    python-chess library & Stockfish engine
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import subprocess
+import os
+import sys
+import chess
+import chess.engine
+import platform
+import atexit
+import queue
+import random
+import threading
+import time
+import weakref
+from contextlib import nullcontext
+from engine_cache import default_cache
+from opening_book import default_book
+from tablebase import default_tablebase
+from engine_pool import EnginePool
+from game_clock import GameClock, allocate_time
+#? -------------------------------------------------------------------------------
+ENGINE_PATH_ENV = "CHESS2D_ENGINE"
+ENGINE_POOL_ENV = "CHESS2D_ENGINES"
+SOUND_ENABLED   = True
+DEFAULT_MOVE_TIME = 0.5
+VOLATILITY_SCALE = 150      # centipawns of evaluation swing between AI moves that doubles its think time
+_sounds         = {}
+
+def register_sounds(sounds):
+    # The UI hands in objects with a play() method; headless games stay silent
+    _sounds.update(sounds)
+
+def play_sound(name):
+    sound = _sounds.get(name)
+    if SOUND_ENABLED and sound:
+        sound.play()
+#? -------------------------------------------------------------------------------
+# Compact position core. Squares are indexed row * 8 + col (row 0 is rank 8, as
+# in ChessGame.board) and each piece is a type code plus a colour bit. The type
+# codes match python-chess (chess.PAWN .. chess.KING).
+EMPTY           = 0
+PAWN            = 1
+KNIGHT          = 2
+BISHOP          = 3
+ROOK            = 4
+QUEEN           = 5
+KING            = 6
+TYPE_MASK       = 7
+BLACK_BIT       = 8
+PIECE_CODES     = {'pawn': PAWN, 'knight': KNIGHT, 'bishop': BISHOP, 'rook': ROOK, 'queen': QUEEN, 'king': KING}
+PIECE_NAMES     = {code: name for name, code in PIECE_CODES.items()}
+COLOR_BITS      = {'white': 0, 'black': BLACK_BIT}
+FEN_LETTERS     = {'pawn': 'p', 'knight': 'n', 'bishop': 'b', 'rook': 'r', 'queen': 'q', 'king': 'k'}
+FEN_PIECES      = {letter: name for name, letter in FEN_LETTERS.items()}
+STARTING_FEN    = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+SAN_LETTERS     = {KNIGHT: 'N', BISHOP: 'B', ROOK: 'R', QUEEN: 'Q', KING: 'K'}
+
+def square_name(square):
+    return 'abcdefgh'[square % 8] + str(8 - square // 8)
+
+def to_chess_move(move):
+    from_sq, to_sq, promotion = move
+    return chess.Move((7 - from_sq // 8) * 8 + from_sq % 8, (7 - to_sq // 8) * 8 + to_sq % 8, promotion or None)
+
+def move_to_uci(move):
+    from_sq, to_sq, promotion = move
+    return square_name(from_sq) + square_name(to_sq) + (FEN_LETTERS[PIECE_NAMES[promotion]] if promotion else '')
+
+def piece_code(piece):
+    if not piece:
+        return EMPTY
+    return PIECE_CODES[piece['type']] | COLOR_BITS[piece['color']]
+
+def encode_board(board):
+    return bytearray(piece_code(board[row][col]) for row in range(8) for col in range(8))
+
+def _leaper_targets(offsets):
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        table.append(tuple((row + dr) * 8 + col + dc for dr, dc in offsets
+                           if 0 <= row + dr < 8 and 0 <= col + dc < 8))
+    return tuple(table)
+
+def _slider_rays(directions):
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        rays = []
+        for dr, dc in directions:
+            ray = []
+            r, c = row + dr, col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                ray.append(r * 8 + c)
+                r, c = r + dr, c + dc
+            if ray:
+                rays.append(tuple(ray))
+        table.append(tuple(rays))
+    return tuple(table)
+
+def _slider_paths(rays):
+    # For every reachable target, the squares strictly between origin and target
+    return tuple({target: ray[:i] for ray in square_rays for i, target in enumerate(ray)}
+                 for square_rays in rays)
+
+KNIGHT_ATTACKS  = _leaper_targets(((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)))
+KING_ATTACKS    = _leaper_targets(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+PAWN_ATTACKS    = {0: _leaper_targets(((-1, -1), (-1, 1))), BLACK_BIT: _leaper_targets(((1, -1), (1, 1)))}
+ROOK_RAYS       = _slider_rays(((-1, 0), (1, 0), (0, -1), (0, 1)))
+BISHOP_RAYS     = _slider_rays(((-1, -1), (-1, 1), (1, -1), (1, 1)))
+ROOK_PATHS      = _slider_paths(ROOK_RAYS)
+BISHOP_PATHS    = _slider_paths(BISHOP_RAYS)
+
+def is_square_attacked(squares, square, by_bit):
+    knight, king, pawn = KNIGHT | by_bit, KING | by_bit, PAWN | by_bit
+    for source in KNIGHT_ATTACKS[square]:
+        if squares[source] == knight:
+            return True
+    for source in KING_ATTACKS[square]:
+        if squares[source] == king:
+            return True
+    # A pawn attacks `square` from the squares a pawn of the other colour would attack
+    for source in PAWN_ATTACKS[by_bit ^ BLACK_BIT][square]:
+        if squares[source] == pawn:
+            return True
+    rook, bishop, queen = ROOK | by_bit, BISHOP | by_bit, QUEEN | by_bit
+    for ray in ROOK_RAYS[square]:
+        for source in ray:
+            piece = squares[source]
+            if piece:
+                if piece == rook or piece == queen:
+                    return True
+                break
+    for ray in BISHOP_RAYS[square]:
+        for source in ray:
+            piece = squares[source]
+            if piece:
+                if piece == bishop or piece == queen:
+                    return True
+                break
+    return False
+
+# Zobrist keys: one 64-bit number per (piece, square), castling right, en passant
+# file and side to move. The seed is fixed so keys are stable across runs and can
+# be stored alongside archived positions.
+_zobrist_random     = random.Random(0x5A0B)
+ZOBRIST_PIECES      = [[0] * 64 if not code & TYPE_MASK or code & TYPE_MASK == 7 else
+                       [_zobrist_random.getrandbits(64) for _ in range(64)] for code in range(16)]
+ZOBRIST_CASTLING    = [_zobrist_random.getrandbits(64) for _ in range(4)]   # K, Q, k, q
+ZOBRIST_EN_PASSANT  = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_MOVE  = _zobrist_random.getrandbits(64)
+
+def castling_hash(rights):
+    key = 0
+    for i, allowed in enumerate(rights):
+        if allowed:
+            key ^= ZOBRIST_CASTLING[i]
+    return key
+#? -------------------------------------------------------------------------------
+class ChessEngine:
+    def __init__(self, engine_path=None):
+        self.engine_dir     = os.path.join(os.path.dirname(__file__), "stockfish")
+        self.engine_path    = engine_path or os.environ.get(ENGINE_PATH_ENV) or self._get_engine_path()
+
+    def _get_engine_path(self):
+        system              = platform.system()
+        if system == "Windows":
+            exe_name        = "stockfish-windows-x86-64-avx2.exe"
+        elif system == "Linux":
+            exe_name        = "stockfish-ubuntu-x86-64-avx2"    # Linux
+        elif system == "Darwin":                               
+            exe_name        = "stockfish-macos-x86-64-avx2"     # macOS
+        else:
+            raise OSError(f"Unsupported OS: {system}")
+        path                = os.path.join(self.engine_dir, exe_name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Stockfish engine not found at: {path}")
+        return path
+
+    def popen(self, options=None):
+        if sys.platform == 'win32':
+            startupinfo                 = subprocess.STARTUPINFO()
+            startupinfo.dwFlags        |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow     = subprocess.SW_HIDE
+            engine                      = chess.engine.SimpleEngine.popen_uci(self.engine_path, startupinfo=startupinfo)
+        else:
+            engine                      = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+        if options:
+            engine.configure(options)
+        return engine
+
+    def analyse_batch(self, positions, limit, multipv=1, processes=1, threads=None, hash_mb=None, options=None):
+        # Analyses FENs, chess.Boards or ChessGames on `processes` engines at once and yields
+        # one result dict per position as it finishes, so results arrive out of input order
+        # (use result['index']). Positions are read lazily from the iterable.
+        engine_options  = dict(options or {})
+        if threads:
+            engine_options['Threads'] = threads
+        if hash_mb:
+            engine_options['Hash'] = hash_mb
+        pending         = enumerate(positions)
+        pending_lock    = threading.Lock()
+        results         = queue.Queue()
+        stop            = threading.Event()
+
+        def work():
+            engine = None
+            try:
+                engine = self.popen(engine_options)
+                while not stop.is_set():
+                    with pending_lock:
+                        item = next(pending, None)
+                    if item is None:
+                        break
+                    try:
+                        results.put(analyse_position(engine, item[0], item[1], limit, multipv))
+                    except (chess.engine.EngineError, chess.engine.EngineTerminatedError, OSError) as e:
+                        # Report the position and replace the engine before taking the next one
+                        results.put({'index': item[0], 'fen': str(item[1]), 'error': f"engine error: {e}"})
+                        engine = restart_engine(engine, lambda: self.popen(engine_options))
+            except Exception as e:
+                results.put(e)
+            finally:
+                if engine:
+                    try:
+                        engine.quit()
+                    except Exception:
+                        pass
+                results.put(None)
+
+        workers = [threading.Thread(target=work, daemon=True) for _ in range(max(1, processes))]
+        for worker in workers:
+            worker.start()
+        running = len(workers)
+        try:
+            while running:
+                result = results.get()
+                if result is None:
+                    running -= 1
+                elif isinstance(result, Exception):
+                    raise result
+                else:
+                    yield result
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+def position_board(position):
+    if isinstance(position, chess.Board):
+        return position
+    if isinstance(position, ChessGame):
+        return position.convert_to_chess_board()
+    return chess.Board(position)
+
+def analyse_position(engine, index, position, limit, multipv=1):
+    # One analysis result: best move, score and the top `multipv` lines. Scores are in
+    # centipawns from White's point of view; `mate` is moves to mate (negative if Black mates).
+    try:
+        board = position_board(position)
+    except ValueError as e:
+        return {'index': index, 'fen': str(position), 'error': f"bad position: {e}"}
+    result = {'index': index, 'fen': board.fen()}
+    if board.is_game_over():
+        result.update(best=None, score=None, mate=None, depth=0, nodes=0, lines=[])
+        return result
+    infos = engine.analyse(board, limit, multipv=multipv)
+    lines = []
+    for info in infos:
+        score = info.get('score')
+        score = score.white() if score else None
+        pv = info.get('pv', [])
+        lines.append({
+            'score':    score.score() if score else None,
+            'mate':     score.mate() if score else None,
+            'pv':       [move.uci() for move in pv],
+            'san':      board.variation_san(pv) if pv else '',
+        })
+    best = lines[0] if lines else {'score': None, 'mate': None, 'pv': []}
+    result.update(
+        best    = best['pv'][0] if best['pv'] else None,
+        score   = best['score'],
+        mate    = best['mate'],
+        depth   = infos[0].get('depth', 0) if infos else 0,
+        nodes   = infos[0].get('nodes', 0) if infos else 0,
+        lines   = lines,
+    )
+    return result
+
+def restart_engine(engine, factory):
+    try:
+        engine.close()
+    except Exception:
+        pass
+    return factory()
+
+class PonderSearch:
+    # Background analysis of the position after the AI's move and the reply it expects,
+    # run while the player thinks. It holds its engine until stopped; on a ponder hit the
+    # time already spent counts towards the move's budget.
+    def __init__(self, lease, board, options=None, game_id=None):
+        # `lease` is a context manager yielding the engine, see ponder_lease
+        self.board          = board
+        self.started        = time.perf_counter()
+        self.result         = None
+        self._lease         = lease
+        self._options       = options or {}
+        self._game_id       = game_id
+        self._analysis      = None
+        self._ready         = threading.Event()
+        self._stop          = threading.Event()
+        self._done          = threading.Event()
+        _ponder_searches.add(self)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        try:
+            # Runs until stopped; hit() applies the move's limits
+            with self._lease as engine:
+                with engine.analysis(self.board, game=self._game_id, options=self._options) as analysis:
+                    self._analysis = analysis
+                    self._ready.set()
+                    self._stop.wait()
+                    analysis.stop()
+                    best = analysis.wait()
+                    self.result = chess.engine.PlayResult(best.move, best.ponder, dict(analysis.info))
+        except Exception as e:
+            print(f"Pondering stopped: {e}")
+        finally:
+            self._ready.set()
+            self._done.set()
+            _ponder_searches.discard(self)
+
+    def matches(self, board):
+        return len(board.move_stack) == len(self.board.move_stack) and board.fen() == self.board.fen()
+
+    def hit(self, limit):
+        # The player made the expected move: search for whatever is left of the budget
+        self._ready.wait()
+        deadline = self.started + limit.time if limit.time is not None else None
+        while self._analysis is not None and not self._done.is_set():
+            info = self._analysis.info
+            if limit.depth is not None and info.get('depth', 0) >= limit.depth:
+                break
+            if limit.nodes is not None and info.get('nodes', 0) >= limit.nodes:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if deadline is None and limit.depth is None and limit.nodes is None:
+                break
+            time.sleep(0.005)
+        self.stop(wait=True)
+        return self.result
+
+    def stop(self, wait=False, timeout=None):
+        self._stop.set()
+        if wait:
+            self._done.wait(timeout)
+
+def ponder_lease(engine):
+    # A pool lends a spare engine or None, so pondering never keeps another game waiting;
+    # a single engine object is used directly
+    return engine.spare_lease() if hasattr(engine, 'spare_lease') else nullcontext(engine)
+
+_ponder_searches = weakref.WeakSet()
+
+def stop_pondering():
+    # Searches hold engine processes, which must be released before the pool closes
+    for search in list(_ponder_searches):
+        search.stop(wait=True, timeout=5)
+
+_engine_pool = None
+
+def shutdown_engines():
+    # Stops pondering and closes the shared pool. Entry points call this on the way out;
+    # it is also registered to run at exit in case they don't.
+    global _engine_pool
+    stop_pondering()
+    pool, _engine_pool = _engine_pool, None
+    if pool is not None:
+        pool.close()
+
+def register_shutdown(func):
+    # Engine processes are served by non-daemon threads, and the interpreter joins those
+    # before running plain atexit handlers, so an unclosed pool would hang the exit.
+    # threading._register_atexit (private, CPython 3.9+) runs before that join; elsewhere
+    # this falls back to atexit and relies on the explicit shutdown_engines() calls.
+    getattr(threading, '_register_atexit', atexit.register)(func)
+
+register_shutdown(shutdown_engines)
+
+def get_engine_pool():
+    # One pool of warm engine processes shared by every game in the process
+    global _engine_pool
+    if _engine_pool is None:
+        engine          = ChessEngine()
+        _engine_pool    = EnginePool(engine.popen, size=int(os.environ.get(ENGINE_POOL_ENV, 1)))
+    return _engine_pool
+
+class ChessGame:
+    def __init__(self, player_color='white', analysis_cache=None, fen=None, use_engine=True, opening_book=None,
+                 tablebase=None):
+        self.log_scroll         = 0 
+        self.board              = self.initialize_board()
+        self.squares            = encode_board(self.board)
+        self.king_squares       = {'white': self.squares.find(KING), 'black': self.squares.find(KING | BLACK_BIT)}
+        self.selected_piece     = None
+        self.current_turn       = 'white'
+        self.valid_moves        = []
+        self.game_over          = False
+        self.winner             = None
+        self.termination        = None      # why the game ended, see update_game_over
+        self.move_log           = []
+        self.en_passant_target  = None
+        self.white_castling     = {'kingside': True, 'queenside': True}
+        self.black_castling     = {'kingside': True, 'queenside': True}
+        self.check              = False
+        self.in_check           = {'white': False, 'black': False}
+        self.promoting_pawn     = None
+        self.pending_promotion  = None
+        self.halfmove_clock     = 0
+        self.fullmove_number    = 1
+        self.start_fen          = STARTING_FEN
+        self.chess_board        = chess.Board()     # python-chess mirror for the engine, see apply_move
+        self.move_stack         = []
+        self._legal_cache       = None
+        self.zobrist_key        = self.compute_zobrist()
+        if fen:
+            self.set_fen(fen)
+        self.engine             = None
+        self.game_id            = object()      # tells the engine when a new game starts
+        self.player_color       = player_color 
+        self.ai_thinking        = False
+        # analysis_cache=False searches every position afresh (self-play must not replay cached lines)
+        if analysis_cache is None:
+            analysis_cache      = default_cache()
+        self.analysis_cache     = None if analysis_cache is False else analysis_cache
+        # opening_book=False always asks the engine; None uses the shared default book, if any
+        if opening_book is None:
+            opening_book        = default_book()
+        self.opening_book       = opening_book or None
+        if tablebase is None:
+            tablebase           = default_tablebase()
+        self.tablebase          = tablebase or None
+        self.search_limit       = chess.engine.Limit(time=DEFAULT_MOVE_TIME)
+        self.engine_options     = {}        # UCI options applied to this game's searches only
+        self.clock              = None      # GameClock, see set_time_control
+        self.time_control       = None
+        self.ai_scores          = []        # White-relative evaluation after each AI search
+        self.ponder_enabled     = True      # think on the player's time after the AI has moved
+        self.ponder_search      = None
+        self.expected_reply     = None      # (FEN searched, move played, predicted reply)
+        if use_engine:
+            self.init_stockfish()
+
+    def init_stockfish(self):
+        # Games lease a process from the shared pool per search instead of owning one.
+        # Without a Stockfish binary the AI falls back to the built-in search.
+        try:
+            self.engine     = get_engine_pool()
+        except Exception as e:
+            print(f"Failed to initialize Stockfish: {e}; using the built-in engine")
+            from search import SearchEngine
+            self.engine     = SearchEngine()
+
+    def get_stockfish_move(self, board=None):
+        if board is None:
+            board   = self.convert_to_chess_board()
+        limit       = self.move_limit()
+        ponder      = self.ponder_search
+        if ponder is not None:
+            self.ponder_search = None
+            if ponder.matches(board):
+                result = ponder.hit(limit)
+                if result and result.move in board.legal_moves:
+                    self.record_score(result.info)
+                    self.expect_reply(board, result.move, result.ponder)
+                    return result.move
+            else:
+                ponder.stop(wait=True)
+        if self.opening_book is not None:
+            move    = self.opening_book.choose(board)
+            if move and move in board.legal_moves:
+                return move
+        if self.tablebase is not None:
+            move    = self.tablebase.best_move(board)
+            if move:
+                return move
+        if not self.engine: return None
+        options     = self.engine_options
+        # Cached moves ignore the game history, so repeated positions go to the engine; clock
+        # budgets differ on every move and would never be looked up again
+        cache       = self.analysis_cache if self.clock is None and not board.is_repetition(2) else None
+        cached      = cache.get(board, limit, options) if cache is not None else None
+        if cached and cached.move in board.legal_moves:
+            self.expect_reply(board, cached.move, cached.pv[1] if cached.pv and len(cached.pv) > 1 else None)
+            return cached.move
+        try:
+            result  = self.engine.play(board, limit, game=self.game_id, options=options,
+                                       info=chess.engine.INFO_SCORE | chess.engine.INFO_PV)
+            if result.move and cache is not None:
+                cache.put(board, limit, result.move, result.info, options)
+            self.record_score(result.info)
+            self.expect_reply(board, result.move, result.ponder)
+            return result.move
+        except Exception as e:
+            print(f"Error getting Stockfish move: {e}")
+            return None
+
+    def set_search_limits(self, time=None, depth=None, nodes=None, skill=None):
+        # Per-game engine budget. With a clock the move time comes from the time manager and
+        # only depth and nodes are kept. skill is Stockfish's Skill Level (0-20).
+        if time is None and depth is None and nodes is None:
+            time = DEFAULT_MOVE_TIME
+        self.search_limit = chess.engine.Limit(time=time, depth=depth, nodes=nodes)
+        if skill is None:
+            self.engine_options.pop('Skill Level', None)
+        else:
+            self.engine_options['Skill Level'] = skill
+
+    def set_time_control(self, base, increment=0.0, black=None):
+        # base seconds plus increment per move; black=(base, increment) gives Black a different
+        # clock. base=None removes the clock.
+        if base is None:
+            self.clock = self.time_control = None
+            return
+        self.time_control   = (base, increment, black)
+        self.clock          = GameClock(base, increment, black)
+        if not self.game_over:
+            self.clock.start(self.current_turn)
+
+    def move_limit(self):
+        # The limit for the side to move's next search
+        limit = self.search_limit
+        if self.clock is None:
+            return limit
+        color = self.current_turn
+        budget = allocate_time(self.clock.time_left(color), self.clock.increment[color], self.fullmove_number,
+                               self.volatility())
+        return chess.engine.Limit(time=budget, depth=limit.depth, nodes=limit.nodes)
+
+    def volatility(self):
+        # 0..1 from how much the evaluation moved between the AI's last two searches
+        if len(self.ai_scores) < 2:
+            return 0.0
+        return min(abs(self.ai_scores[-1] - self.ai_scores[-2]) / VOLATILITY_SCALE, 1.0)
+
+    def record_score(self, info):
+        score = info.get('score') if info else None
+        if score is not None:
+            self.ai_scores.append(score.white().score(mate_score=10000))
+
+    def check_flag(self):
+        # Ends the game when the side to move has run out of time; it is a draw when the
+        # opponent could not mate by any sequence of legal moves, even with the flagged
+        # side's help (FIDE 6.9), which python-chess tests per colour
+        if self.clock is None or self.game_over or not self.clock.flagged(self.current_turn):
+            return False
+        opponent = 'black' if self.current_turn == 'white' else 'white'
+        self.clock.stop()
+        self.cancel_ponder()
+        self.game_over = True
+        board = self.convert_to_chess_board()
+        if board.has_insufficient_material(chess.WHITE if opponent == 'white' else chess.BLACK):
+            self.winner, self.termination = None, 'timeout vs insufficient material'
+        else:
+            self.winner, self.termination = opponent, 'time forfeit'
+        return True
+
+    def expect_reply(self, board, move, reply):
+        self.expected_reply = (board.fen(), move, reply) if move and reply else None
+
+    def start_pondering(self):
+        # Called once the AI's move is on the board: searches the predicted reply in the background
+        expected, self.expected_reply = self.expected_reply, None
+        if (not self.ponder_enabled or expected is None or self.game_over or self.player_color is None or
+                self.ai_to_move() or not (hasattr(self.engine, 'lease') or hasattr(self.engine, 'analysis'))):
+            return False
+        fen, move, reply = expected
+        board = self.convert_to_chess_board()
+        if not board.move_stack or board.move_stack[-1] != move or reply not in board.legal_moves:
+            return False
+        before = board.copy(stack=1)
+        before.pop()
+        if before.fen() != fen:
+            return False
+        board.push(reply)
+        if board.is_game_over(claim_draw=True):
+            return False
+        self.cancel_ponder()
+        lease = ponder_lease(self.engine)
+        if lease is None:
+            return False
+        self.ponder_search = PonderSearch(lease, board, self.engine_options, self.game_id)
+        return True
+
+    def cancel_ponder(self):
+        ponder, self.ponder_search = self.ponder_search, None
+        if ponder is not None:
+            ponder.stop()
+
+    def convert_to_chess_board(self):
+        # A copy of the mirrored board, with the game's moves so the engine sees the history.
+        # Moves pushed without apply_move (searches that pop them again, or callers using
+        # push directly) leave the mirror behind; it is then rebuilt from the move stack.
+        board   = self.chess_board
+        if len(board.move_stack) != len(self.move_stack):
+            board   = self.chess_board = chess.Board(self.start_fen)
+            for undo in self.move_stack:
+                board.push(to_chess_move(undo[0]))
+        return board.copy()
+
+    def ai_to_move(self):
+        return self.current_turn != self.player_color and not self.game_over and not self.promoting_pawn
+
+    def make_ai_move(self):
+        if self.ai_to_move():
+            return self.apply_ai_move(self.get_stockfish_move())
+        return False
+
+    def request_ai_move(self, on_done):
+        # Search on a worker thread so the UI keeps running; on_done(move, key) is
+        # called from that thread and should hand the move back to the main loop
+        if self.ai_thinking or not self.engine or not self.ai_to_move():
+            return False
+        board               = self.convert_to_chess_board()
+        key                 = self.zobrist_key
+        self.ai_thinking    = True
+        worker = threading.Thread(target=lambda: on_done(self.get_stockfish_move(board), key), daemon=True)
+        worker.start()
+        return True
+
+    def apply_ai_move(self, move, key=None):
+        self.ai_thinking = False
+        # Drop results for a position that changed while the engine was searching
+        if not move or (key is not None and key != self.zobrist_key) or not self.ai_to_move():
+            return False
+        from_col    = chess.square_file(move.from_square)
+        from_row    = 7 - chess.square_rank(move.from_square)
+        to_col      = chess.square_file(move.to_square)
+        to_row      = 7 - chess.square_rank(move.to_square)
+        promotion   = PIECE_NAMES[move.promotion] if move.promotion else None
+        if self.move_piece((from_row, from_col), (to_row, to_col)):
+            if promotion and self.promoting_pawn:
+                self.promote_pawn(promotion)
+            self.start_pondering()
+            return True
+        return False
+
+    def initialize_board(self):
+        board                   = [[None for _ in range(8)] for _ in range(8)]
+        for col in range(8):
+            board[1][col]       = {'type': 'pawn', 'color': 'black', 'moved': False}
+            board[6][col]       = {'type': 'pawn', 'color': 'white', 'moved': False}
+        pieces                  = ['rook', 'knight', 'bishop', 'queen', 'king', 'bishop', 'knight', 'rook']
+        for col, piece in enumerate(pieces):
+            board[0][col]       = {'type': piece, 'color': 'black', 'moved': False}
+            board[7][col]       = {'type': piece, 'color': 'white', 'moved': False}
+        return board
+
+    def set_fen(self, fen):
+        fields = fen.split()
+        if len(fields) < 4 or fields[1] not in ('w', 'b'):
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        placement, turn, castling, en_passant = fields[:4]
+        rows = placement.split('/')
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        board = [[None for _ in range(8)] for _ in range(8)]
+        for row, text in enumerate(rows):
+            col = 0
+            for char in text:
+                if char.isdigit():
+                    col += int(char)
+                elif char.lower() in FEN_PIECES and col < 8:
+                    color = 'white' if char.isupper() else 'black'
+                    board[row][col] = {'type': FEN_PIECES[char.lower()], 'color': color, 'moved': False}
+                    col += 1
+                else:
+                    raise ValueError(f"Invalid FEN: {fen!r}")
+            if col != 8:
+                raise ValueError(f"Invalid FEN: {fen!r}")
+        squares = encode_board(board)
+        if squares.count(KING) != 1 or squares.count(KING | BLACK_BIT) != 1:
+            raise ValueError(f"FEN needs exactly one king per side: {fen!r}")
+        if en_passant != '-' and (len(en_passant) != 2 or en_passant[0] not in 'abcdefgh' or
+                                  en_passant[1] not in '36'):
+            raise ValueError(f"Invalid en passant square in FEN: {fen!r}")
+        if not all(field.isdigit() for field in fields[4:6]):
+            raise ValueError(f"Invalid move counters in FEN: {fen!r}")
+
+        self.board              = board
+        self.squares            = squares
+        self.king_squares       = {'white': squares.find(KING), 'black': squares.find(KING | BLACK_BIT)}
+        self.current_turn       = 'white' if turn == 'w' else 'black'
+        # Only keep castling rights whose king and rook are still on their home squares
+        self.white_castling     = {'kingside': 'K' in castling and squares[63] == ROOK and squares[60] == KING,
+                                   'queenside': 'Q' in castling and squares[56] == ROOK and squares[60] == KING}
+        self.black_castling     = {'kingside': 'k' in castling and squares[7] == ROOK | BLACK_BIT and squares[4] == KING | BLACK_BIT,
+                                   'queenside': 'q' in castling and squares[0] == ROOK | BLACK_BIT and squares[4] == KING | BLACK_BIT}
+        self.en_passant_target  = None
+        if en_passant != '-':
+            self.en_passant_target = (8 - int(en_passant[1]), 'abcdefgh'.index(en_passant[0]))
+        self.halfmove_clock     = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove_number    = int(fields[5]) if len(fields) > 5 else 1
+        self.start_fen          = self.fen()
+        self.chess_board        = chess.Board(self.start_fen)
+        self.selected_piece     = None
+        self.valid_moves        = []
+        self.move_log           = []
+        self.move_stack         = []
+        self.promoting_pawn     = None
+        self.pending_promotion  = None
+        self._legal_cache       = None
+        self.zobrist_key        = self.compute_zobrist()
+        self.update_check_state()
+        self.update_game_over()
+
+    def fen(self):
+        rows = []
+        for row in self.board:
+            text, empty = '', 0
+            for piece in row:
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                letter = FEN_LETTERS[piece['type']]
+                text += letter.upper() if piece['color'] == 'white' else letter
+            rows.append(text + str(empty) if empty else text)
+        castling = ''.join(flag for flag, allowed in zip('KQkq', self.castling_rights()) if allowed) or '-'
+        en_passant = self.pos_to_notation(*self.en_passant_target) if self.en_passant_target else '-'
+        return (f"{'/'.join(rows)} {self.current_turn[0]} {castling} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def pos_to_notation(self, row, col):
+        letters     = 'abcdefgh'
+        return f"{letters[col]}{8 - row}"
+
+    def set_piece(self, row, col, piece):
+        square                  = row * 8 + col
+        code                    = piece_code(piece)
+        old_code                = self.squares[square]
+        self.board[row][col]    = piece
+        self.squares[square]    = code
+        self.zobrist_key       ^= ZOBRIST_PIECES[old_code][square] ^ ZOBRIST_PIECES[code][square]
+        # Keep the king squares current so check queries never scan the board
+        if code & TYPE_MASK == KING:
+            self.king_squares[piece['color']] = square
+        elif old_code & TYPE_MASK == KING:
+            color = 'black' if old_code & BLACK_BIT else 'white'
+            if self.king_squares[color] == square:
+                self.king_squares[color] = -1
+
+    def en_passant_square(self):
+        if not self.en_passant_target:
+            return -1
+        ep_row, ep_col = self.en_passant_target
+        return ep_row * 8 + ep_col
+
+    def position_key(self):
+        return self.zobrist_key
+
+    def castling_rights(self):
+        white, black = self.white_castling, self.black_castling
+        return (white['kingside'], white['queenside'], black['kingside'], black['queenside'])
+
+    def en_passant_hash(self):
+        # The en passant file only counts while a pawn of the side to move could capture there
+        if not self.en_passant_target:
+            return 0
+        ep_row, ep_col = self.en_passant_target
+        pawn = PAWN | COLOR_BITS[self.current_turn]
+        pawn_row = ep_row + 1 if self.current_turn == 'black' else ep_row - 1
+        for col in (ep_col - 1, ep_col + 1):
+            if 0 <= col < 8 and self.squares[pawn_row * 8 + col] == pawn:
+                return ZOBRIST_EN_PASSANT[ep_col]
+        return 0
+
+    def compute_zobrist(self):
+        key = 0
+        for square, code in enumerate(self.squares):
+            key ^= ZOBRIST_PIECES[code][square]
+        if self.current_turn == 'black':
+            key ^= ZOBRIST_BLACK_MOVE
+        return key ^ castling_hash(self.castling_rights()) ^ self.en_passant_hash()
+
+    def legal_moves(self):
+        # Moves are (from_sq, to_sq, promotion) tuples, cached until the position changes
+        key = self.position_key()
+        if self._legal_cache is None or self._legal_cache[0] != key:
+            moves = self.generate_legal_moves()
+            self._legal_cache = (key, moves, {(move[0], move[1]) for move in moves})
+        return self._legal_cache[1]
+
+    def legal_moves_from(self, square):
+        from_sq = square[0] * 8 + square[1]
+        return [move for move in self.legal_moves() if move[0] == from_sq]
+
+    def find_checks_and_pins(self, king_sq, us):
+        # Returns the squares giving check and, for each pinned piece, the squares it may still move to
+        squares = self.squares
+        them = us ^ BLACK_BIT
+        checkers = []
+        blocks = set()
+        pins = {}
+        for source in KNIGHT_ATTACKS[king_sq]:
+            if squares[source] == KNIGHT | them:
+                checkers.append(source)
+                blocks.add(source)
+        for source in PAWN_ATTACKS[us][king_sq]:
+            if squares[source] == PAWN | them:
+                checkers.append(source)
+                blocks.add(source)
+        for rays, slider in ((ROOK_RAYS, ROOK | them), (BISHOP_RAYS, BISHOP | them)):
+            queen = QUEEN | them
+            for ray in rays[king_sq]:
+                pinned = -1
+                for i, square in enumerate(ray):
+                    piece = squares[square]
+                    if not piece:
+                        continue
+                    if piece & BLACK_BIT == us:
+                        if pinned >= 0:
+                            break
+                        pinned = square
+                    else:
+                        if piece == slider or piece == queen:
+                            if pinned < 0:
+                                checkers.append(square)
+                                blocks.update(ray[:i + 1])
+                            else:
+                                pins[pinned] = set(ray[:i + 1])
+                        break
+        return checkers, blocks, pins
+
+    def has_legal_move(self):
+        # Stops after the first piece that can move instead of generating every move
+        if self._legal_cache is not None and self._legal_cache[0] == self.position_key():
+            return bool(self._legal_cache[1])
+        return bool(self.generate_legal_moves(first_only=True))
+
+    def generate_legal_moves(self, first_only=False):
+        squares = self.squares
+        us = COLOR_BITS[self.current_turn]
+        them = us ^ BLACK_BIT
+        king_sq = self.king_squares[self.current_turn]
+        if king_sq >= 0:
+            checkers, blocks, pins = self.find_checks_and_pins(king_sq, us)
+        else:
+            checkers, blocks, pins = [], set(), {}
+        ep_sq = self.en_passant_square()
+        moves = []
+        for from_sq in range(64):
+            if first_only and moves:
+                break
+            code = squares[from_sq]
+            if not code or code & BLACK_BIT != us:
+                continue
+            kind = code & TYPE_MASK
+            if kind == KING:
+                squares[from_sq] = EMPTY
+                for to_sq in KING_ATTACKS[from_sq]:
+                    target = squares[to_sq]
+                    if (not target or target & BLACK_BIT == them) and not is_square_attacked(squares, to_sq, them):
+                        moves.append((from_sq, to_sq, 0))
+                squares[from_sq] = code
+                if not checkers:
+                    for to_sq in (from_sq + 2, from_sq - 2):
+                        if self.can_castle(from_sq, to_sq, us) and not is_square_attacked(squares, to_sq, them):
+                            moves.append((from_sq, to_sq, 0))
+                continue
+            if len(checkers) > 1:
+                continue
+            targets = []
+            if kind == PAWN:
+                step = 8 if us else -8
+                to_sq = from_sq + step
+                if 0 <= to_sq < 64 and not squares[to_sq]:
+                    targets.append(to_sq)
+                    if from_sq // 8 == (1 if us else 6) and not squares[to_sq + step]:
+                        targets.append(to_sq + step)
+                for to_sq in PAWN_ATTACKS[us][from_sq]:
+                    target = squares[to_sq]
+                    if target and target & BLACK_BIT == them:
+                        targets.append(to_sq)
+                    elif to_sq == ep_sq and not self.leaves_king_in_check(from_sq, to_sq, code):
+                        # En passant can uncover a rank pin, so it is checked by playing it out
+                        moves.append((from_sq, to_sq, 0))
+            elif kind == KNIGHT:
+                for to_sq in KNIGHT_ATTACKS[from_sq]:
+                    target = squares[to_sq]
+                    if not target or target & BLACK_BIT == them:
+                        targets.append(to_sq)
+            else:
+                rays = ROOK_RAYS[from_sq] if kind == ROOK else BISHOP_RAYS[from_sq] if kind == BISHOP \
+                    else ROOK_RAYS[from_sq] + BISHOP_RAYS[from_sq]
+                for ray in rays:
+                    for to_sq in ray:
+                        target = squares[to_sq]
+                        if target:
+                            if target & BLACK_BIT == them:
+                                targets.append(to_sq)
+                            break
+                        targets.append(to_sq)
+            pin = pins.get(from_sq)
+            promotes = kind == PAWN and from_sq // 8 == (6 if us else 1)
+            for to_sq in targets:
+                if checkers and to_sq not in blocks:
+                    continue
+                if pin is not None and to_sq not in pin:
+                    continue
+                if promotes:
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        moves.append((from_sq, to_sq, promotion))
+                else:
+                    moves.append((from_sq, to_sq, 0))
+        return moves
+
+    def is_in_check(self, color):
+        color_bit = COLOR_BITS[color]
+        king_sq = self.king_squares[color]
+        if king_sq < 0:
+            return False
+        return is_square_attacked(self.squares, king_sq, color_bit ^ BLACK_BIT)
+
+    def update_check_state(self):
+        # Evaluated once per position change; the renderer and notation only read the result
+        self.in_check           = {'white': self.is_in_check('white'), 'black': self.is_in_check('black')}
+        self.check              = self.in_check[self.current_turn]
+
+    def is_valid_move(self, start, end, check_check=True):
+        start_row, start_col = start
+        end_row, end_col = end
+        if not (0 <= start_row < 8 and 0 <= start_col < 8 and 0 <= end_row < 8 and 0 <= end_col < 8):
+            return False
+        from_sq = start_row * 8 + start_col
+        to_sq = end_row * 8 + end_col
+        code = self.squares[from_sq]
+        if not code or code & BLACK_BIT != COLOR_BITS[self.current_turn]:
+            return False
+        if check_check:
+            self.legal_moves()
+            return (from_sq, to_sq) in self._legal_cache[2]
+        return self.is_pseudo_legal(from_sq, to_sq, code)
+
+    def is_pseudo_legal(self, from_sq, to_sq, code):
+        squares = self.squares
+        color_bit = code & BLACK_BIT
+        target = squares[to_sq]
+        if target and target & BLACK_BIT == color_bit:
+            return False
+        kind = code & TYPE_MASK
+        if kind == PAWN:
+            step = 8 if color_bit else -8
+            if to_sq == from_sq + step:
+                return not target
+            if to_sq == from_sq + 2 * step:
+                return (from_sq // 8 == (1 if color_bit else 6) and
+                        not target and not squares[from_sq + step])
+            if to_sq in PAWN_ATTACKS[color_bit][from_sq]:
+                return bool(target) or to_sq == self.en_passant_square()
+            return False
+        if kind == KNIGHT:
+            return to_sq in KNIGHT_ATTACKS[from_sq]
+        if kind == KING:
+            return to_sq in KING_ATTACKS[from_sq] or self.can_castle(from_sq, to_sq, color_bit)
+        path = None
+        if kind != BISHOP:
+            path = ROOK_PATHS[from_sq].get(to_sq)
+        if path is None and kind != ROOK:
+            path = BISHOP_PATHS[from_sq].get(to_sq)
+        if path is None:
+            return False
+        for square in path:
+            if squares[square]:
+                return False
+        return True
+
+    def can_castle(self, from_sq, to_sq, color_bit):
+        home = 4 if color_bit else 60
+        if from_sq != home or (to_sq != home + 2 and to_sq != home - 2):
+            return False
+        squares = self.squares
+        rights = self.black_castling if color_bit else self.white_castling
+        if to_sq > from_sq:
+            if not rights['kingside'] or squares[home + 3] != ROOK | color_bit:
+                return False
+            if squares[home + 1] or squares[home + 2]:
+                return False
+        else:
+            if not rights['queenside'] or squares[home - 4] != ROOK | color_bit:
+                return False
+            if squares[home - 1] or squares[home - 2] or squares[home - 3]:
+                return False
+        # The king may not castle out of or through check
+        enemy_bit = color_bit ^ BLACK_BIT
+        return not (is_square_attacked(squares, from_sq, enemy_bit) or
+                    is_square_attacked(squares, (from_sq + to_sq) // 2, enemy_bit))
+
+    def leaves_king_in_check(self, from_sq, to_sq, code):
+        self.push((from_sq, to_sq, 0))
+        in_check = self.is_in_check('black' if code & BLACK_BIT else 'white')
+        self.pop()
+        return in_check
+
+    def would_be_in_check(self, start, end):
+        from_sq = start[0] * 8 + start[1]
+        code = self.squares[from_sq]
+        if not code:
+            return False
+        return self.leaves_king_in_check(from_sq, end[0] * 8 + end[1], code)
+
+    def push(self, move):
+        # Play a (from_sq, to_sq, promotion) move without validation, recording what pop() needs
+        from_sq, to_sq, promotion = move
+        start_row, start_col = divmod(from_sq, 8)
+        end_row, end_col = divmod(to_sq, 8)
+        board = self.board
+        piece = board[start_row][start_col]
+        captured = board[end_row][end_col]
+        captured_sq = to_sq
+        rook_moved = None
+        moved = piece['moved']
+        white, black = self.white_castling, self.black_castling
+        rights = self.castling_rights()
+        en_passant_target = self.en_passant_target
+        key = self.zobrist_key
+        halfmove_clock = self.halfmove_clock
+        self.zobrist_key ^= self.en_passant_hash()
+
+        kind = PIECE_CODES[piece['type']]
+        home_row = 7 if piece['color'] == 'white' else 0
+        if kind == PAWN and captured is None and start_col != end_col:
+            captured_sq = start_row * 8 + end_col
+            captured = board[start_row][end_col]
+            self.set_piece(start_row, end_col, None)
+        elif kind == KING and abs(start_col - end_col) == 2:
+            rook_start_col, rook_end_col = (7, 5) if end_col > start_col else (0, 3)
+            rook = board[start_row][rook_start_col]
+            self.set_piece(start_row, rook_end_col, rook)
+            self.set_piece(start_row, rook_start_col, None)
+            rook_moved = rook['moved']
+            rook['moved'] = True
+
+        self.en_passant_target = None
+        if kind == PAWN and abs(start_row - end_row) == 2:
+            self.en_passant_target = (start_row + (end_row - start_row) // 2, start_col)
+
+        own_rights = white if piece['color'] == 'white' else black
+        if kind == KING:
+            own_rights['kingside'] = own_rights['queenside'] = False
+        elif kind == ROOK and start_row == home_row:
+            if start_col == 0:
+                own_rights['queenside'] = False
+            elif start_col == 7:
+                own_rights['kingside'] = False
+        # Capturing a rook on its home corner also removes that castling right
+        if captured and captured['type'] == 'rook' and end_row == 7 - home_row and end_col in (0, 7):
+            their_rights = white if captured['color'] == 'white' else black
+            their_rights['queenside' if end_col == 0 else 'kingside'] = False
+
+        if promotion:
+            self.set_piece(end_row, end_col, {'type': PIECE_NAMES[promotion], 'color': piece['color'], 'moved': True})
+        else:
+            self.set_piece(end_row, end_col, piece)
+        self.set_piece(start_row, start_col, None)
+        piece['moved'] = True
+        self.halfmove_clock = 0 if kind == PAWN or captured else halfmove_clock + 1
+        if self.current_turn == 'black':
+            self.fullmove_number += 1
+        self.current_turn = 'black' if self.current_turn == 'white' else 'white'
+        self.zobrist_key ^= (ZOBRIST_BLACK_MOVE ^ self.en_passant_hash() ^
+                             castling_hash(rights) ^ castling_hash(self.castling_rights()))
+
+        self.move_stack.append((move, piece, captured, captured_sq, moved, rook_moved, rights, en_passant_target, key,
+                                halfmove_clock))
+
+    def pop(self):
+        (move, piece, captured, captured_sq, moved, rook_moved, rights, en_passant_target, key,
+         halfmove_clock) = self.move_stack.pop()
+        from_sq, to_sq, promotion = move
+        start_row, start_col = divmod(from_sq, 8)
+        end_row, end_col = divmod(to_sq, 8)
+        self.set_piece(start_row, start_col, piece)
+        self.set_piece(end_row, end_col, None)
+        if captured:
+            self.set_piece(captured_sq // 8, captured_sq % 8, captured)
+        piece['moved'] = moved
+        if rook_moved is not None:
+            rook_start_col, rook_end_col = (7, 5) if end_col > start_col else (0, 3)
+            rook = self.board[start_row][rook_end_col]
+            self.set_piece(start_row, rook_start_col, rook)
+            self.set_piece(start_row, rook_end_col, None)
+            rook['moved'] = rook_moved
+        white, black = self.white_castling, self.black_castling
+        white['kingside'], white['queenside'], black['kingside'], black['queenside'] = rights
+        self.en_passant_target = en_passant_target
+        self.current_turn = 'black' if self.current_turn == 'white' else 'white'
+        if self.current_turn == 'black':
+            self.fullmove_number -= 1
+        self.halfmove_clock = halfmove_clock
+        self.zobrist_key = key
+        return move
+
+    def move_piece(self, start, end):
+        if self.check_flag() or not self.is_valid_move(start, end):
+            return False
+        piece = self.board[start[0]][start[1]]
+        if piece['type'] == 'pawn' and (end[0] == 0 or end[0] == 7):
+            # Wait for promote_pawn to choose the piece before playing the move
+            self.promoting_pawn     = end
+            self.pending_promotion  = (start[0] * 8 + start[1], end[0] * 8 + end[1])
+            play_sound('notify')
+            return True
+        self.apply_move((start[0] * 8 + start[1], end[0] * 8 + end[1], 0))
+        return True
+
+    def apply_move(self, move):
+        # Game-level move: push plus sounds, check state, game end and the move log
+        start, end = divmod(move[0], 8), divmod(move[1], 8)
+        piece = self.board[start[0]][start[1]]
+        notation = self.san_without_suffix(move)
+        self.push(move)
+        self.chess_board.push(to_chess_move(move))
+        if self.clock is not None:
+            self.clock.press(self.move_stack[-1][1]['color'])
+        if self.ponder_search is not None and not self.ponder_search.matches(self.chess_board):
+            # The player did not play the predicted reply; the next search starts afresh
+            self.cancel_ponder()
+        captured = self.move_stack[-1][2]
+
+        if piece['type'] == 'king' and abs(start[1] - end[1]) == 2:
+            play_sound('castle')
+        elif captured:
+            play_sound('capture')
+        elif not move[2]:
+            play_sound('move')
+
+        self.update_check_state()
+        if self.check:
+            play_sound('check')
+        self.update_game_over()
+        if self.game_over:
+            # A ponder search would otherwise hold its engine until the next game
+            self.cancel_ponder()
+            if self.clock is not None:
+                self.clock.stop()
+
+        self.move_log.append(notation + ('#' if self.termination == 'checkmate' else '+' if self.check else ''))
+
+    def takeback(self):
+        if not self.move_stack:
+            return False
+        self.cancel_ponder()
+        self.pop()
+        if len(self.chess_board.move_stack) > len(self.move_stack):
+            self.chess_board.pop()
+        if self.move_log:
+            self.move_log.pop()
+        self.promoting_pawn     = None
+        self.pending_promotion  = None
+        self.selected_piece     = None
+        self.valid_moves        = []
+        self.update_check_state()
+        self.update_game_over()
+        if self.clock is not None:
+            # Time already used stays used; the clock just follows the side to move
+            self.clock.start(None if self.game_over else self.current_turn)
+        return True
+
+    def update_game_over(self):
+        # Termination evaluator, run once per position change
+        self.game_over      = True
+        self.winner         = None
+        if not self.has_legal_move():
+            # No legal reply: checkmate if the side to move is in check, stalemate otherwise
+            if self.check:
+                self.termination    = 'checkmate'
+                self.winner         = 'black' if self.current_turn == 'white' else 'white'
+            else:
+                self.termination    = 'stalemate'
+        elif self.halfmove_clock >= 100:
+            self.termination    = 'fifty-move rule'
+        elif self.has_insufficient_material():
+            self.termination    = 'insufficient material'
+        elif self.repetition_count() >= 3:
+            self.termination    = 'threefold repetition'
+        else:
+            self.game_over      = False
+            self.termination    = None
+
+    def repetition_count(self):
+        # Positions before the last capture or pawn move cannot recur, so only the last
+        # halfmove_clock plies are compared; move_stack[-i] holds the key from i plies ago
+        key = self.zobrist_key
+        stack = self.move_stack
+        count = 1
+        for ply in range(2, min(self.halfmove_clock, len(stack)) + 1, 2):
+            if stack[-ply][8] == key:
+                count += 1
+        return count
+
+    def has_insufficient_material(self):
+        # Neither side can mate: bare kings, a single minor piece, or only bishops that all
+        # stand on squares of one colour
+        squares = self.squares
+        for kind in (PAWN, ROOK, QUEEN):
+            if kind in squares or kind | BLACK_BIT in squares:
+                return False
+        minors = [(code & TYPE_MASK, square) for square, code in enumerate(squares)
+                  if code & TYPE_MASK in (KNIGHT, BISHOP)]
+        if len(minors) <= 1:
+            return True
+        if any(kind == KNIGHT for kind, _ in minors):
+            return False
+        return len({(square // 8 + square % 8) % 2 for _, square in minors}) == 1
+    
+    def tablebase_result(self):
+        # Result with best play according to the tablebase: 'white', 'black', 'draw' or None.
+        # Wins that the fifty-move rule turns into draws count as draws.
+        if self.tablebase is None:
+            return None
+        wdl = self.tablebase.probe_wdl(chess.Board(self.fen()))
+        if wdl is None:
+            return None
+        if abs(wdl) < 2:
+            return 'draw'
+        opponent = 'black' if self.current_turn == 'white' else 'white'
+        return self.current_turn if wdl > 0 else opponent
+
+    def adjudicate(self):
+        # Ends the game early once the tablebase knows its result; used by headless runs,
+        # the UI lets the players finish
+        if self.game_over:
+            return False
+        result = self.tablebase_result()
+        if result is None:
+            return False
+        self.game_over      = True
+        self.winner         = None if result == 'draw' else result
+        self.termination    = 'tablebase'
+        return True
+
+    def san(self, move):
+        # Standard algebraic notation for a legal move in the current position
+        notation = self.san_without_suffix(move)
+        self.push(move)
+        in_check = self.is_in_check(self.current_turn)
+        mated = in_check and not self.has_legal_move()
+        self.pop()
+        return notation + ('#' if mated else '+' if in_check else '')
+
+    def san_without_suffix(self, move):
+        from_sq, to_sq, promotion = move
+        squares = self.squares
+        code = squares[from_sq]
+        kind = code & TYPE_MASK
+        if kind == KING and abs(to_sq - from_sq) == 2:
+            return 'O-O' if to_sq > from_sq else 'O-O-O'
+        capture = bool(squares[to_sq]) or (kind == PAWN and from_sq % 8 != to_sq % 8)
+        if kind == PAWN:
+            notation = ('abcdefgh'[from_sq % 8] + 'x' if capture else '') + square_name(to_sq)
+            return notation + ('=' + SAN_LETTERS[promotion] if promotion else '')
+        # Disambiguate by file, then rank, then both when another piece of the same kind
+        # could also move to the target square
+        others = [other[0] for other in self.legal_moves()
+                  if other[1] == to_sq and other[0] != from_sq and squares[other[0]] == code]
+        prefix = ''
+        if others:
+            if all(other % 8 != from_sq % 8 for other in others):
+                prefix = square_name(from_sq)[0]
+            elif all(other // 8 != from_sq // 8 for other in others):
+                prefix = square_name(from_sq)[1]
+            else:
+                prefix = square_name(from_sq)
+        return SAN_LETTERS[kind] + prefix + ('x' if capture else '') + square_name(to_sq)
+
+    def result(self):
+        if not self.game_over:
+            return '*'
+        return {'white': '1-0', 'black': '0-1'}.get(self.winner, '1/2-1/2')
+
+    def promote_pawn(self, piece_type):
+        if not self.promoting_pawn or not self.pending_promotion:
+            return False
+        from_sq, to_sq          = self.pending_promotion
+        self.promoting_pawn     = None
+        self.pending_promotion  = None
+        
+        play_sound('promote')
+        
+        self.apply_move((from_sq, to_sq, PIECE_CODES[piece_type]))
+        return True
+
+    def export_move_log(self):
+        # Interactive wrapper: asks for a file name and writes the game with pgn_writer
+        try:
+            import tkinter as tk
+            from tkinter import filedialog
+            from pgn_writer import write_pgn
+            root = tk.Tk()
+            root.withdraw()  # Hide the main window
+            
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".pgn",
+                filetypes=[("PGN files", "*.pgn"), ("All files", "*.*")],
+                title="Save game as",
+                initialfile="chess_game.pgn"
+            )
+            root.destroy()
+            
+            if file_path:  # Only proceed if user didn't cancel
+                write_pgn(file_path, self)
+                print(f"Game exported to {file_path}")
+                play_sound('notify')
+        except Exception as e:
+            print(f"Error exporting move log: {e}")
+
+    def reset_game(self):
+        # A new game with the same players, engine settings and time control
+        self.cancel_ponder()
+        settings = (self.search_limit, self.engine_options, self.ponder_enabled, self.time_control)
+        self.__init__(player_color=self.player_color,
+                      analysis_cache=self.analysis_cache if self.analysis_cache is not None else False,
+                      opening_book=self.opening_book if self.opening_book is not None else False,
+                      tablebase=self.tablebase if self.tablebase is not None else False)
+        self.search_limit, self.engine_options, self.ponder_enabled, time_control = settings
+        if time_control:
+            self.set_time_control(*time_control)
+        play_sound('notify')
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        engine_cache.py
+#? Purpose:     LRU + optional sqlite cache of engine search results
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import os
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+import chess
+import chess.engine
+#? -------------------------------------------------------------------------------
+# score is relative to the side to move (chess.engine.Cp / chess.engine.Mate)
+CachedAnalysis  = namedtuple('CachedAnalysis', ['move', 'score', 'pv'])
+
+CACHE_PATH_ENV  = "CHESS2D_CACHE_PATH"
+CACHE_SIZE_ENV  = "CHESS2D_CACHE_SIZE"
+
+def position_key(board):
+    # FEN without the move counters, so transpositions share an entry
+    return board.epd()
+
+def limit_key(limit, options=None):
+    # UCI options such as Skill Level change the result, so they are part of the key
+    key = f"time={limit.time} depth={limit.depth} nodes={limit.nodes} mate={limit.mate}"
+    if options:
+        key += "".join(f" {name}={value}" for name, value in sorted(options.items()))
+    return key
+
+def _score_to_text(score):
+    if score is None:
+        return ""
+    if score.is_mate():
+        return f"mate {score.mate()}"
+    return f"cp {score.score()}"
+
+def _score_from_text(text):
+    if not text:
+        return None
+    kind, value = text.split()
+    return chess.engine.Mate(int(value)) if kind == "mate" else chess.engine.Cp(int(value))
+
+class AnalysisCache:
+    def __init__(self, max_entries=4096, path=None, max_disk_entries=200000):
+        self.max_entries        = max_entries
+        self.max_disk_entries   = max_disk_entries
+        self.hits               = 0
+        self.misses             = 0
+        self._entries           = OrderedDict()
+        self._lock              = threading.Lock()      # shared by the UI and AI worker threads
+        self._db                = None
+        self._clock             = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS analysis ("
+                             "position TEXT, search_limit TEXT, move TEXT, score TEXT, pv TEXT, "
+                             "last_used INTEGER, PRIMARY KEY (position, search_limit))")
+            self._db.execute("CREATE INDEX IF NOT EXISTS analysis_last_used ON analysis (last_used)")
+            row = self._db.execute("SELECT MAX(last_used) FROM analysis").fetchone()
+            self._clock = row[0] or 0
+
+    def get(self, board, limit, options=None):
+        key = (position_key(board), limit_key(limit, options))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                entry = self._load(key)
+                if entry is not None:
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, board, limit, move, info=None, options=None):
+        info = info or {}
+        score = info.get("score")
+        entry = CachedAnalysis(move, score.relative if score is not None else None, list(info.get("pv", [])))
+        key = (position_key(board), limit_key(limit, options))
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._store(key, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM analysis")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key):
+        row = self._db.execute("SELECT move, score, pv FROM analysis WHERE position = ? AND search_limit = ?",
+                               key).fetchone()
+        if row is None:
+            return None
+        self._clock += 1
+        self._db.execute("UPDATE analysis SET last_used = ? WHERE position = ? AND search_limit = ?",
+                         (self._clock,) + key)
+        self._db.commit()
+        move, score, pv = row
+        return CachedAnalysis(chess.Move.from_uci(move), _score_from_text(score),
+                              [chess.Move.from_uci(uci) for uci in pv.split()])
+
+    def _store(self, key, entry):
+        self._clock += 1
+        self._db.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?, ?, ?)",
+                         key + (entry.move.uci(), _score_to_text(entry.score),
+                                " ".join(move.uci() for move in entry.pv), self._clock))
+        # Evict the least recently used rows in batches once the table outgrows its limit
+        if self._clock % 256 == 0:
+            count = self._db.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+            if count > self.max_disk_entries:
+                self._db.execute("DELETE FROM analysis WHERE rowid IN "
+                                 "(SELECT rowid FROM analysis ORDER BY last_used LIMIT ?)",
+                                 (count - self.max_disk_entries,))
+        self._db.commit()
+
+_default_cache = None
+
+def default_cache():
+    # Process-wide cache shared by every game; CHESS2D_CACHE_PATH enables the sqlite store
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnalysisCache(max_entries=int(os.environ.get(CACHE_SIZE_ENV, 4096)),
+                                       path=os.environ.get(CACHE_PATH_ENV))
+    return _default_cache
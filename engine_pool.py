@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        engine_pool.py
+#? Purpose:     Shared pool of warm UCI engine processes leased to games per search
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import queue
+import threading
+import time
+from contextlib import contextmanager
+import chess.engine
+#? -------------------------------------------------------------------------------
+class PoolBusyError(RuntimeError):
+    pass
+
+class EnginePool:
+    def __init__(self, factory, size=1, max_waiting=32, timeout=30.0, health_interval=60.0):
+        # factory() must return a started chess.engine.SimpleEngine
+        self.factory            = factory
+        self.size               = size
+        self.timeout            = timeout
+        self.health_interval    = health_interval
+        self._idle              = queue.LifoQueue(maxsize=size)   # most recently used engine first
+        self._slots             = threading.BoundedSemaphore(size + max_waiting)
+        self._lock              = threading.Lock()
+        self._started           = 0
+        self._last_used         = {}
+        self._closed            = False
+        self.restarts           = 0
+
+    def warm(self):
+        # Start every process up front instead of on first demand
+        engines = [self._acquire() for _ in range(self.size)]
+        for engine in engines:
+            self._release(engine)
+
+    def lease(self):
+        return self._lease(self._acquire())
+
+    def spare_lease(self):
+        # A lease for background work such as pondering, or None. It is only granted when an
+        # engine is free right now and another stays free (idle or not yet started), so
+        # games never wait behind background work. The lease must be entered.
+        try:
+            engine = self._acquire(blocking=False)
+        except PoolBusyError:
+            return None
+        with self._lock:
+            spare = self._idle.qsize() + self.size - self._started
+        if spare < 1:
+            self._release(engine)
+            return None
+        return self._lease(engine)
+
+    @contextmanager
+    def _lease(self, engine):
+        healthy = True
+        try:
+            yield engine
+        except (chess.engine.EngineError, chess.engine.EngineTerminatedError, OSError):
+            healthy = False
+            raise
+        finally:
+            self._release(engine, healthy)
+
+    def play(self, board, limit, game=None, **kwargs):
+        # `game` identifies the caller's game; python-chess sends ucinewgame whenever the
+        # engine serves a different game than in its previous command
+        with self.lease() as engine:
+            return engine.play(board, limit, game=game, **kwargs)
+
+    def analyse(self, board, limit, game=None, **kwargs):
+        with self.lease() as engine:
+            return engine.analyse(board, limit, game=game, **kwargs)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._shutdown(engine)
+
+    def _acquire(self, blocking=True):
+        if self._closed:
+            raise RuntimeError("Engine pool is closed")
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusyError("Too many games waiting for an engine")
+        try:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                engine = None
+                with self._lock:
+                    spawn = self._started < self.size
+                    if spawn:
+                        self._started += 1
+                if spawn:
+                    try:
+                        engine = self.factory()
+                    except Exception:
+                        with self._lock:
+                            self._started -= 1
+                        raise
+                elif not blocking:
+                    raise PoolBusyError("No idle engine")
+                else:
+                    try:
+                        engine = self._idle.get(timeout=self.timeout)
+                    except queue.Empty:
+                        raise PoolBusyError(f"No engine became free within {self.timeout} s")
+            if time.monotonic() - self._last_used.get(engine, time.monotonic()) > self.health_interval:
+                engine = self._check_health(engine)
+            return engine
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, engine, healthy=True):
+        try:
+            if not healthy:
+                try:
+                    engine = self._restart(engine)
+                except Exception:
+                    return
+            if self._closed:
+                self._shutdown(engine)
+            else:
+                self._last_used[engine] = time.monotonic()
+                self._idle.put_nowait(engine)
+        finally:
+            self._slots.release()
+
+    def _check_health(self, engine):
+        try:
+            engine.ping()
+            return engine
+        except Exception:
+            return self._restart(engine)
+
+    def _restart(self, engine):
+        self._shutdown(engine)
+        self.restarts += 1
+        try:
+            return self.factory()
+        except Exception:
+            # Give the slot back so a later lease can try to spawn again
+            with self._lock:
+                self._started -= 1
+            raise
+
+    def _shutdown(self, engine):
+        self._last_used.pop(engine, None)
+        try:
+            engine.quit()
+        except Exception:
+            try:
+                engine.close()
+            except Exception:
+                pass
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        game_clock.py
+#? Purpose:     Chess clocks with increment and the time manager that turns the
+#?              remaining clock into a per-move engine budget
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import re
+import threading
+import time
+#? -------------------------------------------------------------------------------
+TIME_CONTROL_RE     = re.compile(r"^\s*(\d+(?:\.\d*)?)\s*(?:\+\s*(\d+(?:\.\d*)?))?\s*$")
+MIN_MOVES_TO_GO     = 20        # the time manager always keeps time for this many more moves
+EXPECTED_MOVES      = 50        # ...and early on assumes the game lasts about this long
+MAX_CLOCK_SHARE     = 0.25      # never spend more than this share of the clock on one move
+MOVE_OVERHEAD       = 0.05      # seconds kept back for engine and UI latency
+
+def parse_time_control(text):
+    # "300+2" -> (300.0, 2.0): base seconds plus increment per move
+    match = TIME_CONTROL_RE.match(text or '')
+    if not match:
+        raise ValueError(f"Invalid time control {text!r}, expected e.g. 300+2")
+    return float(match.group(1)), float(match.group(2) or 0)
+
+def format_clock(seconds):
+    seconds = max(seconds, 0.0)
+    if seconds < 10:
+        return f"{seconds:.1f}"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+class GameClock:
+    # Both sides' clocks; the side to move runs. press() is called with the colour that
+    # just moved and adds its increment (Fischer).
+    def __init__(self, base, increment=0.0, black=None):
+        black_base, black_increment = black if black else (base, increment)
+        self.base           = {'white': float(base), 'black': float(black_base)}
+        self.increment      = {'white': float(increment), 'black': float(black_increment)}
+        self.remaining      = dict(self.base)
+        self.running        = None
+        self.started        = None
+        self._lock          = threading.Lock()      # read by the UI, pressed from AI threads
+
+    def _charge(self, now):
+        if self.running:
+            self.remaining[self.running] -= now - self.started
+
+    def start(self, color):
+        with self._lock:
+            now = time.perf_counter()
+            self._charge(now)
+            self.running, self.started = color, now
+
+    def press(self, color):
+        with self._lock:
+            now = time.perf_counter()
+            if self.running == color:
+                self._charge(now)
+                self.remaining[color] += self.increment[color]
+            self.running = 'black' if color == 'white' else 'white'
+            self.started = now
+
+    def stop(self):
+        with self._lock:
+            self._charge(time.perf_counter())
+            self.running = None
+
+    def time_left(self, color):
+        with self._lock:
+            left = self.remaining[color]
+            if self.running == color:
+                left -= time.perf_counter() - self.started
+            return left
+
+    def flagged(self, color):
+        return self.time_left(color) <= 0
+
+def allocate_time(remaining, increment=0.0, move_number=1, volatility=0.0, moves_to_go=None):
+    # Seconds to search one move: an even share of the clock over the moves still expected,
+    # plus most of the increment, stretched by up to 2x when the evaluation is swinging
+    # (volatility 0..1) and capped so one move never eats the clock
+    if moves_to_go is None:
+        moves_to_go = max(MIN_MOVES_TO_GO, EXPECTED_MOVES - move_number)
+    budget = (remaining / max(moves_to_go, 1) + increment * 0.8) * (1 + min(max(volatility, 0.0), 1.0))
+    budget = min(budget, remaining * MAX_CLOCK_SHARE, remaining - MOVE_OVERHEAD)
+    return max(budget, 0.01)
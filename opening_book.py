@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        opening_book.py
+#? Purpose:     Polyglot opening book lookup in front of the engine
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import os
+import random
+import threading
+import chess
+import chess.polyglot
+#? -------------------------------------------------------------------------------
+BOOK_PATH_ENV       = "CHESS2D_BOOK"
+BOOK_DEPTH_ENV      = "CHESS2D_BOOK_DEPTH"
+BOOK_SELECTION_ENV  = "CHESS2D_BOOK_SELECTION"
+DEFAULT_BOOK        = os.path.join(os.path.dirname(os.path.abspath(__file__)), "books", "book.bin")
+SELECTIONS          = ('weighted', 'best')
+
+class OpeningBook:
+    # The .bin file is memory-mapped by python-chess and searched by position key, so
+    # opening a large book is instant and only the pages that are probed are read
+    def __init__(self, path, max_depth=20, selection='weighted', seed=None):
+        if selection not in SELECTIONS:
+            raise ValueError(f"Unknown book selection {selection!r}, expected one of {SELECTIONS}")
+        self.path           = path
+        self.max_depth      = max_depth       # plies from the start of the game
+        self.selection      = selection
+        self.random         = random.Random(seed)
+        self.hits           = 0
+        self.misses         = 0
+        self._reader        = chess.polyglot.open_reader(path)
+        self._lock          = threading.Lock()  # random.Random and the counters are shared by AI threads
+
+    def choose(self, board):
+        # A book move for `board`, or None when out of book or past max_depth
+        if self.max_depth is not None and board.ply() >= self.max_depth:
+            return None
+        with self._lock:
+            try:
+                if self.selection == 'best':
+                    entry = self._reader.find(board)
+                else:
+                    entry = self._reader.weighted_choice(board, random=self.random)
+            except IndexError:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry.move
+
+    def moves(self, board):
+        # All book moves with their weights, best first
+        entries = sorted(self._reader.find_all(board), key=lambda entry: entry.weight, reverse=True)
+        return [(entry.move, entry.weight) for entry in entries]
+
+    def close(self):
+        self._reader.close()
+
+_default_book = None
+_default_book_lock = threading.Lock()
+
+def default_book():
+    # Process-wide book shared by every game: CHESS2D_BOOK or books/book.bin if present.
+    # Returns None when there is no book.
+    global _default_book
+    with _default_book_lock:
+        if _default_book is None:
+            path = os.environ.get(BOOK_PATH_ENV) or DEFAULT_BOOK
+            if not os.path.exists(path):
+                _default_book = False
+            else:
+                try:
+                    _default_book = OpeningBook(path, max_depth=int(os.environ.get(BOOK_DEPTH_ENV, 20)),
+                                                selection=os.environ.get(BOOK_SELECTION_ENV, 'weighted'))
+                except (OSError, ValueError) as e:
+                    print(f"Couldn't open opening book {path}: {e}")
+                    _default_book = False
+        return _default_book or None
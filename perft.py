@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        perft.py
+#? Purpose:     Perft node counts for ChessGame move generation: benchmark and
+#?              correctness check against the standard reference positions
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import argparse
+import sys
+import time
+from chess_core import ChessGame, BLACK_BIT, STARTING_FEN, encode_board, move_to_uci, square_name
+#? -------------------------------------------------------------------------------
+# (name, FEN, node counts for depth 1, 2, ...) from the Chess Programming Wiki
+REFERENCE_POSITIONS = [
+    ("start", STARTING_FEN,
+     [20, 400, 8902, 197281]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862]),
+    ("endgame-en-passant", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238]),
+    ("promotion-castling", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467]),
+    ("discovered-check", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379]),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890]),
+]
+
+def new_game(fen):
+    return ChessGame(fen=fen, use_engine=False)
+
+def perft(game, depth):
+    if depth == 0:
+        return 1
+    moves = game.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in list(moves):
+        game.push(move)
+        nodes += perft(game, depth - 1)
+        game.pop()
+    return nodes
+
+def divide(game, depth):
+    # Node count below each root move, for comparing against another move generator
+    counts = {}
+    for move in list(game.legal_moves()):
+        game.push(move)
+        counts[move_name(move)] = perft(game, depth - 1)
+        game.pop()
+    return counts
+
+def move_name(move):
+    return move_to_uci(move)
+
+def check_rules(game, depth):
+    # Walks the tree and checks that the square-based is_valid_move() accepts exactly the
+    # generated moves, and that pop() restores the position it started from
+    if depth == 0:
+        return 0
+    errors = 0
+    moves = list(game.legal_moves())
+    generated = {(move[0], move[1]) for move in moves}
+    color_bit = 0 if game.current_turn == 'white' else BLACK_BIT
+    for from_sq, code in enumerate(game.squares):
+        if not code or code & BLACK_BIT != color_bit:
+            continue
+        for to_sq in range(64):
+            accepted = game.is_valid_move(divmod(from_sq, 8), divmod(to_sq, 8))
+            if accepted != ((from_sq, to_sq) in generated):
+                print(f"  {game.fen()}: is_valid_move {square_name(from_sq)}{square_name(to_sq)} "
+                      f"returned {accepted}")
+                errors += 1
+    before = (bytes(game.squares), game.fen(), game.zobrist_key)
+    for move in moves:
+        game.push(move)
+        if encode_board(game.board) != game.squares:
+            print(f"  {game.fen()}: board and squares disagree after {move_name(move)}")
+            errors += 1
+        errors += check_rules(game, depth - 1)
+        game.pop()
+        if (bytes(game.squares), game.fen(), game.zobrist_key) != before:
+            print(f"  {before[1]}: pop() did not restore the position after {move_name(move)}")
+            errors += 1
+    return errors
+
+def run_suite(max_depth, verify_depth):
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        game = new_game(fen)
+        for depth, count in enumerate(expected[:max_depth], 1):
+            start = time.perf_counter()
+            nodes = perft(game, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == count else f"FAIL (expected {count})"
+            failures += nodes != count
+            print(f"{name:<20} depth {depth}  {nodes:>9} nodes  {elapsed:8.3f} s  "
+                  f"{nodes / max(elapsed, 1e-9):>10.0f} nps  {status}")
+        if verify_depth:
+            errors = check_rules(game, verify_depth)
+            failures += errors
+            print(f"{name:<20} rules check to depth {verify_depth}: {'ok' if not errors else f'{errors} errors'}")
+    print(f"total {total_nodes} nodes in {total_time:.3f} s, {total_nodes / max(total_time, 1e-9):.0f} nps")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count perft leaf nodes with the ChessGame move generator.")
+    parser.add_argument("depth", type=int, nargs="?", default=3, help="search depth (default 3)")
+    parser.add_argument("--fen", help="position to search (default: run the reference suite)")
+    parser.add_argument("--divide", action="store_true", help="print the node count below each root move")
+    parser.add_argument("--verify", type=int, default=0, metavar="DEPTH",
+                        help="also cross-check is_valid_move and push/pop to this depth")
+    args = parser.parse_args(argv)
+
+    if not args.fen:
+        return 1 if run_suite(args.depth, args.verify) else 0
+
+    game = new_game(args.fen)
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(game, args.depth)
+        for name in sorted(counts):
+            print(f"{name}: {counts[name]}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(game, args.depth)
+    elapsed = time.perf_counter() - start
+    print(f"nodes {nodes}  time {elapsed:.3f} s  nps {nodes / max(elapsed, 1e-9):.0f}")
+    if args.verify:
+        errors = check_rules(game, args.verify)
+        print(f"rules check to depth {args.verify}: {'ok' if not errors else f'{errors} errors'}")
+        return 1 if errors else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
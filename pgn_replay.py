@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        pgn_replay.py
+#? Purpose:     Streaming PGN reader that replays and validates games through ChessGame
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import argparse
+import itertools
+import multiprocessing
+import re
+import sys
+import time
+from collections import namedtuple
+from chess_core import ChessGame, PIECE_CODES, PIECE_NAMES, TYPE_MASK
+#? -------------------------------------------------------------------------------
+PgnGame         = namedtuple('PgnGame', ['headers', 'moves', 'result'])
+
+HEADER_RE       = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN_RE        = re.compile(r"\{[^}]*\}?|;[^\n]*|[()]|\$\d+|1-0|0-1|1/2-1/2|\*|\d+\.+|[^\s{}();.]+\.*")
+GAME_END_RE     = re.compile(r"[{}();]|(?<![\w/-])(?:1-0|0-1|1/2-1/2|\*)(?![\w/-])")
+SAN_RE          = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$")
+RESULTS         = ('1-0', '0-1', '1/2-1/2', '*')
+SAN_PIECES      = {'N': PIECE_CODES['knight'], 'B': PIECE_CODES['bishop'], 'R': PIECE_CODES['rook'],
+                   'Q': PIECE_CODES['queen'], 'K': PIECE_CODES['king']}
+
+def iter_game_texts(lines):
+    # Splits a PGN stream into per-game chunks of lines without parsing them, so big files
+    # and stdin are read one game at a time. A game ends at its result token outside
+    # comments and variations, or failing that at a header line after movetext.
+    chunk = []
+    in_moves = False
+    in_comment = False
+    depth = 0
+    for line in lines:
+        stripped = line.strip()
+        header = not in_comment and stripped.startswith('[')
+        if header and in_moves:
+            yield chunk
+            chunk, in_moves, depth = [], False, 0
+        if stripped.startswith('%'):
+            continue
+        if header:
+            chunk.append(line)
+            continue
+        while line:
+            end = None
+            for match in GAME_END_RE.finditer(line):
+                token = match.group()
+                if in_comment:
+                    in_comment = token != '}'
+                elif token == '{':
+                    in_comment = True
+                elif token == ';':
+                    break
+                elif token == '(':
+                    depth += 1
+                elif token == ')':
+                    depth = max(0, depth - 1)
+                elif token != '}' and not depth:
+                    end = match.end()
+                    break
+            if end is None:
+                chunk.append(line)
+                in_moves = in_moves or bool(line.strip())
+                break
+            # Tag-less games can follow on the same line or the next one
+            chunk.append(line[:end] + '\n')
+            yield chunk
+            chunk, in_moves, depth = [], False, 0
+            line = line[end:] if line[end:].strip() else ''
+    if any(line.strip() for line in chunk):
+        yield chunk
+
+def parse_game(lines):
+    headers = {}
+    movetext = []
+    for line in lines:
+        stripped = line.strip()
+        if not movetext and stripped.startswith('['):
+            for name, value in HEADER_RE.findall(stripped):
+                headers[name] = value.replace('\\"', '"').replace('\\\\', '\\')
+        elif stripped:
+            movetext.append(line)
+    moves = []
+    result = headers.get('Result', '*')
+    depth = 0
+    for token in TOKEN_RE.findall(''.join(movetext)):
+        first = token[0]
+        if first in '{;$' or first.isdigit() and token.endswith('.'):
+            continue
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(0, depth - 1)
+        elif depth:
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            moves.append(token)
+    return PgnGame(headers, moves, result)
+
+def iter_games(stream):
+    for lines in iter_game_texts(stream):
+        yield parse_game(lines)
+
+def parse_san(game, san):
+    # Resolves a SAN move against the legal moves of `game`; returns a (from, to, promotion)
+    # tuple or raises ValueError for an illegal, ambiguous or malformed move
+    text = san.rstrip('+#!?')
+    legal = game.legal_moves()
+    if text in ('O-O', 'O-O-O', '0-0', '0-0-0'):
+        king_sq = game.king_squares[game.current_turn]
+        to_sq = king_sq + (2 if len(text) == 3 else -2)
+        if (king_sq, to_sq, 0) in legal:
+            return (king_sq, to_sq, 0)
+        raise ValueError("illegal castling")
+    match = SAN_RE.match(text)
+    if not match:
+        raise ValueError("malformed move")
+    piece, from_file, from_rank, target, promotion = match.groups()
+    kind = SAN_PIECES[piece] if piece else PIECE_CODES['pawn']
+    to_sq = (8 - int(target[1])) * 8 + 'abcdefgh'.index(target[0])
+    promotion = SAN_PIECES[promotion] if promotion else 0
+    squares = game.squares
+    candidates = [move for move in legal
+                  if move[1] == to_sq and move[2] == promotion and squares[move[0]] & TYPE_MASK == kind and
+                  (not from_file or move[0] % 8 == 'abcdefgh'.index(from_file)) and
+                  (not from_rank or 8 - move[0] // 8 == int(from_rank))]
+    if len(candidates) == 1:
+        return candidates[0]
+    raise ValueError("ambiguous move" if candidates else "illegal move")
+
+def replay_game(pgn_game):
+    # Plays the game through move_piece/promote_pawn; returns (plies played, error, game)
+    # where error is None or a (move, reason) pair
+    fen = pgn_game.headers.get('FEN')
+    try:
+        game = ChessGame(player_color=None, analysis_cache=False, fen=fen, use_engine=False)
+    except ValueError as e:
+        return 0, ('FEN', str(e)), None
+    for ply, san in enumerate(pgn_game.moves):
+        try:
+            from_sq, to_sq, promotion = parse_san(game, san)
+        except ValueError as e:
+            move = f"{game.fullmove_number}{'.' if game.current_turn == 'white' else '...'} {san}"
+            return ply, (move, str(e)), game
+        game.move_piece(divmod(from_sq, 8), divmod(to_sq, 8))
+        if promotion:
+            game.promote_pawn(PIECE_NAMES[promotion])
+    return len(pgn_game.moves), None, game
+
+def replay_batch(batch):
+    # Worker entry point: replays a list of (game number, lines) and returns small summaries
+    results = []
+    for number, lines in batch:
+        pgn_game = parse_game(lines)
+        plies, error, game = replay_game(pgn_game)
+        label = f"{pgn_game.headers.get('White', '?')} - {pgn_game.headers.get('Black', '?')}"
+        results.append((number, label, plies, error, game.termination if game else None))
+    return results
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def replay_stream(stream, workers=1, batch_size=200, report=None):
+    # Replays every game in `stream`; report(number, label, move, reason) is called per
+    # illegal move. Returns totals and throughput.
+    stats = {'games': 0, 'plies': 0, 'errors': 0}
+    start = time.perf_counter()
+    batches = batched(enumerate(iter_game_texts(stream), 1), batch_size)
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap(replay_batch, batches)
+    else:
+        pool = None
+        results = map(replay_batch, batches)
+    try:
+        for batch in results:
+            for number, label, plies, error, termination in batch:
+                stats['games'] += 1
+                stats['plies'] += plies
+                if error:
+                    stats['errors'] += 1
+                    if report:
+                        report(number, label, *error)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay PGN games through ChessGame and report illegal moves.")
+    parser.add_argument("pgn", nargs="?", default="-", help="PGN file to read ('-' for stdin, the default)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1)")
+    parser.add_argument("--batch", type=int, default=200, help="games sent to a worker at a time")
+    args = parser.parse_args(argv)
+
+    def report(number, label, move, reason):
+        print(f"game {number} ({label}): {reason} at {move}")
+
+    stream = sys.stdin if args.pgn == "-" else open(args.pgn, encoding="utf-8", errors="replace")
+    try:
+        stats = replay_stream(stream, workers=args.workers, batch_size=args.batch, report=report)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    seconds = max(stats['seconds'], 1e-9)
+    print(f"{stats['games']} games, {stats['plies']} plies, {stats['errors']} with illegal moves")
+    print(f"{seconds:.2f} s: {stats['games'] / seconds:.0f} games/s, {stats['plies'] / seconds:.0f} plies/s")
+    return 1 if stats['errors'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        pgn_writer.py
+#? Purpose:     SAN/PGN and NDJSON game export with buffered writers for bulk output
+#?              from headless runs
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import datetime
+import json
+from chess_core import STARTING_FEN, move_to_uci
+#? -------------------------------------------------------------------------------
+SEVEN_TAG_ROSTER = ['Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result']
+LINE_WIDTH      = 80
+# ChessGame.termination (and self-play's own reasons) to the PGN Termination tag; anything
+# else is a game decided on the board. The detailed reason goes in a final comment.
+PGN_TERMINATIONS = {
+    'time forfeit':                     "time forfeit",
+    'timeout vs insufficient material': "time forfeit",
+    'tablebase':                        "adjudication",
+    'move limit':                       "adjudication",
+    'engine failure':                   "unterminated",
+}
+
+def pgn_termination(reason):
+    return PGN_TERMINATIONS.get(reason, "normal")
+
+def game_headers(game, headers=None):
+    # Seven Tag Roster defaults for a ChessGame, overridden by `headers`
+    if game.player_color is None:
+        white = black = "Stockfish"
+    else:
+        white = "Player" if game.player_color == 'white' else "Stockfish"
+        black = "Stockfish" if game.player_color == 'white' else "Player"
+    values = {
+        'Event':    "Chess2D game",
+        'Site':     "?",
+        'Date':     datetime.date.today().strftime("%Y.%m.%d"),
+        'Round':    "-",
+        'White':    white,
+        'Black':    black,
+    }
+    if game.termination:
+        values['Termination'] = pgn_termination(game.termination)
+    values.update(headers or {})
+    return values
+
+def format_pgn(moves, headers=None, result='*', start_fen=STARTING_FEN, comment=None):
+    # moves are SAN strings; a non-standard start position adds the SetUp and FEN tags and
+    # `comment` is written after the last move
+    headers = dict(headers or {})
+    headers['Result'] = result
+    if start_fen != STARTING_FEN:
+        headers['SetUp'] = '1'
+        headers['FEN'] = start_fen
+    names = SEVEN_TAG_ROSTER + [name for name in headers if name not in SEVEN_TAG_ROSTER]
+    lines = []
+    for name in names:
+        value = str(headers.get(name, '?')).replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f'[{name} "{value}"]')
+    lines.append('')
+
+    fields = start_fen.split()
+    black_first = len(fields) > 1 and fields[1] == 'b'
+    number = int(fields[5]) if len(fields) > 5 else 1
+    tokens = []
+    for ply, san in enumerate(moves):
+        white_move = (ply % 2 == 0) != black_first
+        if white_move:
+            tokens.append(f"{number}.")
+        elif ply == 0:
+            tokens.append(f"{number}...")
+        tokens.append(san)
+        if not white_move:
+            number += 1
+    if comment:
+        tokens.append("{" + comment.replace("}", ")") + "}")
+    tokens.append(result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
+
+def game_pgn(game, headers=None):
+    return format_pgn(game.move_log, game_headers(game, headers), game.result(), game.start_fen,
+                      game.termination)
+
+def game_record(game, headers=None):
+    # One NDJSON object per game
+    return {
+        'headers':      game_headers(game, headers),
+        'start_fen':    game.start_fen,
+        'moves':        list(game.move_log),
+        'uci':          [move_to_uci(undo[0]) for undo in game.move_stack],
+        'result':       game.result(),
+        'termination':  game.termination,
+        'fen':          game.fen(),
+    }
+
+class GameWriter:
+    # Collects games formatted by `formatter(game, headers)` and writes them to `stream` in
+    # large chunks, so headless runs are not limited by one write call per game. Use as a
+    # context manager or call close(); the stream itself is left open.
+    def __init__(self, stream, formatter, buffer_games=500):
+        self.stream         = stream
+        self.formatter      = formatter
+        self.buffer_games   = buffer_games
+        self.buffer         = []
+        self.count          = 0
+
+    def write(self, game, headers=None):
+        self.write_text(self.formatter(game, headers))
+
+    def write_text(self, text):
+        self.buffer.append(text)
+        self.count += 1
+        if len(self.buffer) >= self.buffer_games:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write(''.join(self.buffer))
+            self.buffer = []
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PgnWriter(GameWriter):
+    def __init__(self, stream, buffer_games=500):
+        super().__init__(stream, lambda game, headers: game_pgn(game, headers) + "\n", buffer_games)
+
+    def write_moves(self, moves, headers=None, result='*', start_fen=STARTING_FEN, comment=None):
+        # For callers that only kept the SAN list, e.g. results sent back from worker processes
+        self.write_text(format_pgn(moves, headers, result, start_fen, comment) + "\n")
+
+class NdjsonWriter(GameWriter):
+    def __init__(self, stream, buffer_games=500):
+        super().__init__(stream, lambda game, headers: json.dumps(game_record(game, headers)) + "\n",
+                         buffer_games)
+
+    def write_record(self, record):
+        self.write_text(json.dumps(record) + "\n")
+
+def write_pgn(path, game, headers=None, append=False):
+    with open(path, "a" if append else "w", encoding="utf-8") as stream:
+        with PgnWriter(stream) as writer:
+            writer.write(game, headers)
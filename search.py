@@ -0,0 +1,544 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        search.py
+#? Purpose:     Built-in alpha-beta engine on top of the ChessGame rules, used when
+#?              no Stockfish binary is available
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import argparse
+import sys
+import time
+import chess
+import chess.engine
+from chess_core import (ChessGame, BISHOP, BISHOP_RAYS, BLACK_BIT, KING, KING_ATTACKS, KNIGHT, KNIGHT_ATTACKS,
+                        PAWN, PAWN_ATTACKS, QUEEN, ROOK, ROOK_RAYS, TYPE_MASK, is_square_attacked, move_to_uci,
+                        to_chess_move)
+#? -------------------------------------------------------------------------------
+MATE            = 100000
+MATE_BOUND      = MATE - 1000       # scores above this are mates, adjusted by ply in the table
+INFINITY        = MATE + 1
+MAX_DEPTH       = 64
+EXACT, LOWER, UPPER = 0, 1, 2
+TT_SIZE         = 1 << 20           # entries kept before the table is cleared
+CHECK_EVERY     = 1023              # nodes between clock checks (mask)
+DELTA_MARGIN    = 200               # quiescence skips captures that leave the score this far below alpha
+
+PIECE_VALUES    = [0, 100, 320, 330, 500, 900, 0, 0]
+# Piece-square tables from White's side, a8 first like ChessGame.squares
+PAWN_TABLE = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0]
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50]
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20]
+ROOK_TABLE = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0]
+QUEEN_TABLE = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20]
+KING_TABLE = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20]
+KING_ENDGAME_TABLE = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50]
+ENDGAME_MATERIAL = 1300             # non-pawn material per side at or below which kings centralize
+
+def _eval_table(king_table):
+    # Signed value of every piece code on every square from White's point of view
+    tables = [None, PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, king_table]
+    table = [[0] * 64 for _ in range(16)]
+    for kind in range(1, 7):
+        for square in range(64):
+            table[kind][square] = PIECE_VALUES[kind] + tables[kind][square]
+            table[kind | BLACK_BIT][square] = -(PIECE_VALUES[kind] + tables[kind][square ^ 56])
+    return table
+
+MIDDLEGAME_EVAL = _eval_table(KING_TABLE)
+ENDGAME_EVAL    = _eval_table(KING_ENDGAME_TABLE)
+
+class SearchTimeout(Exception):
+    pass
+
+class Search:
+    # One search over a private ChessGame; the transposition table and history outlive it
+    def __init__(self, game, limit, tt, history, on_iteration=None):
+        self.game           = game
+        self.tt             = tt
+        self.history        = history
+        self.on_iteration   = on_iteration
+        self.killers        = [[None, None] for _ in range(MAX_DEPTH + 32)]
+        self.nodes          = 0
+        self.seldepth       = 0
+        self.max_depth      = min(limit.depth or MAX_DEPTH, MAX_DEPTH)
+        self.max_nodes      = limit.nodes
+        self.start          = time.perf_counter()
+        self.soft_time, self.hard_time = time_budget(limit, game.current_turn)
+        self.can_stop       = False
+        non_pawn = sum(PIECE_VALUES[code & TYPE_MASK] for code in game.squares if code & TYPE_MASK > PAWN)
+        self.table          = ENDGAME_EVAL if non_pawn <= 2 * ENDGAME_MATERIAL else MIDDLEGAME_EVAL
+
+    def evaluate(self):
+        table = self.table
+        score = 0
+        for square, code in enumerate(self.game.squares):
+            if code:
+                score += table[code][square]
+        return score
+
+    def move_delta(self, move):
+        # Change in the White-relative evaluation caused by `move`, computed before it is played
+        from_sq, to_sq, promotion = move
+        squares = self.game.squares
+        table = self.table
+        code = squares[from_sq]
+        delta = table[code][to_sq] - table[code][from_sq]
+        captured = squares[to_sq]
+        if captured:
+            delta -= table[captured][to_sq]
+        kind = code & TYPE_MASK
+        if kind == PAWN:
+            if promotion:
+                delta += table[promotion | code & BLACK_BIT][to_sq] - table[code][to_sq]
+            elif not captured and from_sq % 8 != to_sq % 8:
+                delta -= table[code ^ BLACK_BIT][from_sq - from_sq % 8 + to_sq % 8]
+        elif kind == KING and abs(to_sq - from_sq) == 2:
+            rook = ROOK | code & BLACK_BIT
+            rook_from, rook_to = (from_sq + 3, from_sq + 1) if to_sq > from_sq else (from_sq - 4, from_sq - 1)
+            delta += table[rook][rook_to] - table[rook][rook_from]
+        return delta
+
+    def check_limits(self):
+        if not self.can_stop:
+            return
+        if self.max_nodes and self.nodes >= self.max_nodes:
+            raise SearchTimeout
+        if self.hard_time is not None and time.perf_counter() - self.start >= self.hard_time:
+            raise SearchTimeout
+
+    def in_check(self):
+        game = self.game
+        us = game.current_turn
+        return is_square_attacked(game.squares, game.king_squares[us], BLACK_BIT if us == 'white' else 0)
+
+    def order_moves(self, moves, tt_move, ply):
+        squares = self.game.squares
+        killers = self.killers[ply]
+        history = self.history
+
+        def score(move):
+            if move == tt_move:
+                return 10000000
+            victim = squares[move[1]]
+            if victim:
+                # MVV-LVA: most valuable victim first, cheapest attacker among equals
+                return 1000000 + PIECE_VALUES[victim & TYPE_MASK] * 10 - (squares[move[0]] & TYPE_MASK)
+            if move[2]:
+                return 900000 + move[2]
+            if move == killers[0]:
+                return 800000
+            if move == killers[1]:
+                return 700000
+            return history.get(move, 0)
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def iterate(self):
+        # Iterative deepening; returns (score, pv, depth) of the deepest completed iteration
+        game = self.game
+        base = len(game.move_stack)
+        best = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score = self.search(depth, -INFINITY, INFINITY, 0, self.evaluate())
+            except SearchTimeout:
+                while len(game.move_stack) > base:
+                    game.pop()
+                break
+            best = (score, self.principal_variation(depth), depth)
+            self.can_stop = True
+            if self.on_iteration:
+                self.on_iteration(self.info(*best))
+            elapsed = time.perf_counter() - self.start
+            # Stop when the next iteration is unlikely to finish, or once a mate is found
+            if self.soft_time is not None and elapsed >= self.soft_time:
+                break
+            if abs(score) >= MATE_BOUND or (self.max_nodes and self.nodes >= self.max_nodes):
+                break
+        return best
+
+    def search(self, depth, alpha, beta, ply, evaluation):
+        game = self.game
+        self.nodes += 1
+        if not self.nodes & CHECK_EVERY:
+            self.check_limits()
+        if ply and (game.halfmove_clock >= 100 or game.repetition_count() > 1):
+            return 0
+        in_check = self.in_check()
+        if in_check:
+            depth += 1
+        if depth <= 0:
+            return self.quiesce(alpha, beta, ply, evaluation)
+
+        key = game.zobrist_key
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry:
+            entry_depth, entry_score, flag, tt_move = entry
+            if ply and entry_depth >= depth:
+                entry_score = score_from_tt(entry_score, ply)
+                if flag == EXACT or (flag == LOWER and entry_score >= beta) or (flag == UPPER and entry_score <= alpha):
+                    return entry_score
+
+        moves = game.generate_legal_moves()
+        if not moves:
+            return -MATE + ply if in_check else 0
+        self.order_moves(moves, tt_move, ply)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for index, move in enumerate(moves):
+            quiet = not game.squares[move[1]] and not move[2]
+            child = evaluation + self.move_delta(move)
+            game.push(move)
+            if index == 0:
+                score = -self.search(depth - 1, -beta, -alpha, ply + 1, child)
+            else:
+                # Principal variation search: prove the move is worse with a null window first
+                score = -self.search(depth - 1, -alpha - 1, -alpha, ply + 1, child)
+                if alpha < score < beta:
+                    score = -self.search(depth - 1, -beta, -alpha, ply + 1, child)
+            game.pop()
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if quiet:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1], killers[0] = killers[0], move
+                            self.history[move] = self.history.get(move, 0) + depth * depth
+                        break
+
+        flag = UPPER if best_score <= original_alpha else LOWER if best_score >= beta else EXACT
+        if len(self.tt) >= TT_SIZE:
+            self.tt.clear()
+        self.tt[key] = (depth, score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def quiesce(self, alpha, beta, ply, evaluation):
+        # Captures and promotions only, until the position is quiet; all evasions when in check.
+        # Outside check the moves are generated pseudo-legally and verified after playing them.
+        game = self.game
+        self.nodes += 1
+        if not self.nodes & CHECK_EVERY:
+            self.check_limits()
+        self.seldepth = max(self.seldepth, ply)
+        if self.in_check():
+            moves = game.generate_legal_moves()
+            if not moves:
+                return -MATE + ply
+            best_score = -INFINITY
+        else:
+            stand_pat = evaluation if game.current_turn == 'white' else -evaluation
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            moves = self.good_captures(self.captures(), stand_pat, alpha)
+            best_score = alpha
+        self.order_moves(moves, None, ply)
+        mover = game.current_turn
+        them = BLACK_BIT if mover == 'white' else 0
+        for move in moves:
+            child = evaluation + self.move_delta(move)
+            game.push(move)
+            if is_square_attacked(game.squares, game.king_squares[mover], them):
+                game.pop()
+                continue
+            score = -self.quiesce(-beta, -alpha, ply + 1, child)
+            game.pop()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def captures(self):
+        # Pseudo-legal captures and queen promotions for the side to move
+        game = self.game
+        squares = game.squares
+        us = 0 if game.current_turn == 'white' else BLACK_BIT
+        them = us ^ BLACK_BIT
+        ep_sq = game.en_passant_square()
+        last_rank = range(0, 8) if not us else range(56, 64)
+        moves = []
+        for from_sq, code in enumerate(squares):
+            if not code or code & BLACK_BIT != us:
+                continue
+            kind = code & TYPE_MASK
+            if kind == PAWN:
+                for to_sq in PAWN_ATTACKS[us][from_sq]:
+                    target = squares[to_sq]
+                    if target and target & BLACK_BIT == them or to_sq == ep_sq:
+                        moves.append((from_sq, to_sq, QUEEN if to_sq in last_rank else 0))
+                to_sq = from_sq + (8 if us else -8)
+                if to_sq in last_rank and not squares[to_sq]:
+                    moves.append((from_sq, to_sq, QUEEN))
+            elif kind == KNIGHT or kind == KING:
+                for to_sq in (KNIGHT_ATTACKS if kind == KNIGHT else KING_ATTACKS)[from_sq]:
+                    target = squares[to_sq]
+                    if target and target & BLACK_BIT == them:
+                        moves.append((from_sq, to_sq, 0))
+            else:
+                rays = ROOK_RAYS[from_sq] if kind == ROOK else BISHOP_RAYS[from_sq] if kind == BISHOP \
+                    else ROOK_RAYS[from_sq] + BISHOP_RAYS[from_sq]
+                for ray in rays:
+                    for to_sq in ray:
+                        target = squares[to_sq]
+                        if target:
+                            if target & BLACK_BIT == them:
+                                moves.append((from_sq, to_sq, 0))
+                            break
+        return moves
+
+    def good_captures(self, moves, stand_pat, alpha):
+        # Captures and promotions worth searching in quiescence: skips captures that cannot
+        # raise alpha even if the piece is won for free (delta pruning) and captures of a
+        # cheaper piece on a defended square
+        squares = self.game.squares
+        them = BLACK_BIT if self.game.current_turn == 'white' else 0
+        captures = []
+        for move in moves:
+            from_sq, to_sq, promotion = move
+            attacker = PIECE_VALUES[squares[from_sq] & TYPE_MASK]
+            victim = squares[to_sq]
+            if victim:
+                victim = PIECE_VALUES[victim & TYPE_MASK]
+            elif promotion:
+                captures.append(move)
+                continue
+            elif attacker == PIECE_VALUES[PAWN] and from_sq % 8 != to_sq % 8:
+                victim = PIECE_VALUES[PAWN]
+            else:
+                continue
+            if promotion:
+                captures.append(move)
+            elif stand_pat + victim + DELTA_MARGIN < alpha:
+                continue
+            elif attacker > victim and is_square_attacked(squares, to_sq, them):
+                continue
+            else:
+                captures.append(move)
+        return captures
+
+    def principal_variation(self, depth):
+        # Follows best moves through the transposition table from the root
+        game = self.game
+        pv = []
+        for _ in range(depth):
+            entry = self.tt.get(game.zobrist_key)
+            if not entry or entry[3] is None or entry[3] not in game.generate_legal_moves():
+                break
+            pv.append(entry[3])
+            game.push(entry[3])
+        for _ in pv:
+            game.pop()
+        return pv
+
+    def info(self, score, pv, depth):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        turn = chess.WHITE if self.game.current_turn == 'white' else chess.BLACK
+        if abs(score) >= MATE_BOUND:
+            plies = MATE - abs(score)
+            relative = chess.engine.Mate((plies + 1) // 2 if score > 0 else -(plies // 2))
+        else:
+            relative = chess.engine.Cp(score)
+        return {
+            'depth':    depth,
+            'seldepth': max(self.seldepth, depth),
+            'nodes':    self.nodes,
+            'nps':      int(self.nodes / elapsed),
+            'time':     elapsed,
+            'score':    chess.engine.PovScore(relative, turn),
+            'pv':       [to_chess_move(move) for move in pv],
+        }
+
+def score_to_tt(score, ply):
+    # Mate scores are stored relative to the node so they stay valid at other plies
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+def score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+def time_budget(limit, turn):
+    # (soft, hard) seconds: no new iteration starts after the soft limit and the search is
+    # cut off at the hard limit. A fixed move time uses all of it; a clock is spread over
+    # the expected remaining moves.
+    if limit.time is not None:
+        return limit.time * 0.6, limit.time
+    clock = limit.white_clock if turn == 'white' else limit.black_clock
+    if clock is None:
+        return None, None
+    increment = (limit.white_inc if turn == 'white' else limit.black_inc) or 0
+    moves_to_go = limit.remaining_moves or 30
+    target = clock / moves_to_go + increment * 0.75
+    hard = min(target * 3, clock * 0.25)
+    return min(target, hard) * 0.6, hard
+
+class SearchEngine:
+    # Stands in for a python-chess SimpleEngine behind ChessGame.get_stockfish_move()
+    def __init__(self):
+        self.tt             = {}
+        self.history        = {}
+        self.last_info      = {}
+
+    def game_from_board(self, board):
+        # Replays the board's move stack so repetitions in the game history are seen
+        root = board.root()
+        game = ChessGame(player_color=None, analysis_cache=False, fen=root.fen(en_passant='fen'),
+                         use_engine=False)
+        for move in board.move_stack:
+            from_sq = (7 - chess.square_rank(move.from_square)) * 8 + chess.square_file(move.from_square)
+            to_sq = (7 - chess.square_rank(move.to_square)) * 8 + chess.square_file(move.to_square)
+            game.push((from_sq, to_sq, move.promotion or 0))
+        return game
+
+    def search(self, board, limit, on_iteration=None):
+        game = self.game_from_board(board)
+        search = Search(game, limit, self.tt, self.history, on_iteration)
+        best = search.iterate()
+        self.history.clear()
+        if best is None:
+            moves = game.generate_legal_moves()
+            if not moves:
+                return None, {}
+            best = (0, [moves[0]], 0)
+        info = search.info(*best)
+        self.last_info = info
+        return best[1], info
+
+    def play(self, board, limit, game=None, options=None, info=None, **kwargs):
+        if game is not None and game is not getattr(self, 'game_id', None):
+            # A new game: drop the table like ucinewgame would
+            self.game_id = game
+            self.tt.clear()
+        pv, result_info = self.search(board, limit)
+        if not pv:
+            return chess.engine.PlayResult(None, None, result_info)
+        moves = result_info['pv'] or [to_chess_move(pv[0])]
+        return chess.engine.PlayResult(moves[0], moves[1] if len(moves) > 1 else None, result_info)
+
+    def analyse(self, board, limit, multipv=None, **kwargs):
+        _, info = self.search(board, limit)
+        return [info] if multipv is not None else info
+
+    def configure(self, options):
+        pass
+
+    def ping(self):
+        pass
+
+    def quit(self):
+        self.tt.clear()
+
+    close = quit
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search a position with the built-in engine.")
+    parser.add_argument("--fen", action="append", help="position to search (repeatable; default: a benchmark set)")
+    parser.add_argument("--time", type=float, help="seconds per position (default 0.5)")
+    parser.add_argument("--depth", type=int, help="search depth per position")
+    parser.add_argument("--nodes", type=int, help="node limit per position")
+    args = parser.parse_args(argv)
+
+    limit = chess.engine.Limit(time=args.time, depth=args.depth, nodes=args.nodes)
+    if args.time is None and args.depth is None and args.nodes is None:
+        limit.time = 0.5
+    if args.fen:
+        positions = args.fen
+    else:
+        from perft import REFERENCE_POSITIONS
+        positions = [fen for _, fen, _ in REFERENCE_POSITIONS]
+
+    def report(info):
+        score = info['score'].relative
+        score = f"mate {score.mate()}" if score.is_mate() else f"cp {score.score()}"
+        print(f"  depth {info['depth']:>2} seldepth {info['seldepth']:>2} {score:<9} nodes {info['nodes']:>8} "
+              f"nps {info['nps']:>6} time {info['time']:.2f}  pv {' '.join(move.uci() for move in info['pv'])}")
+
+    total_nodes = 0
+    total_time = 0.0
+    for fen in positions:
+        print(fen)
+        engine = SearchEngine()
+        pv, info = engine.search(chess.Board(fen), limit, on_iteration=report)
+        total_nodes += info.get('nodes', 0)
+        total_time += info.get('time', 0.0)
+        print(f"  bestmove {move_to_uci(pv[0]) if pv else '(none)'}")
+    print(f"total {total_nodes} nodes in {total_time:.2f} s, {total_nodes / max(total_time, 1e-9):.0f} nps")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        selfplay.py
+#? Purpose:     Headless engine-vs-engine matches spread over a process pool,
+#?              with PGN output and an Elo summary
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import argparse
+import math
+import multiprocessing
+import multiprocessing.util
+import os
+import sys
+import time
+import chess.engine
+from chess_core import ChessEngine, ChessGame, STARTING_FEN, shutdown_engines, to_chess_move
+from game_clock import parse_time_control
+from pgn_writer import PgnWriter, pgn_termination
+#? -------------------------------------------------------------------------------
+RESULTS         = {'white': '1-0', 'black': '0-1', None: '1/2-1/2'}
+
+class EngineSettings:
+    # Parsed from "time=0.1,depth=12,nodes=20000,skill=10,tc=60+0.5"; other keys are passed
+    # as UCI options. With tc (base+increment seconds) the move time comes from the game clock.
+    def __init__(self, text):
+        self.text           = text
+        self.limit          = chess.engine.Limit()
+        self.options        = {}
+        self.time_control   = None
+        for item in filter(None, text.split(',')):
+            name, _, value = item.partition('=')
+            name = name.strip()
+            if name == 'time':
+                self.limit.time = float(value)
+            elif name in ('depth', 'nodes'):
+                setattr(self.limit, name, int(value))
+            elif name == 'skill':
+                self.options['Skill Level'] = int(value)
+            elif name == 'tc':
+                self.time_control = parse_time_control(value)
+            else:
+                self.options[name] = value
+        if self.limit.time is None and self.limit.depth is None and self.limit.nodes is None:
+            self.limit.time = 0.1
+
+    def __str__(self):
+        return self.text
+
+_engine = None
+
+def init_worker(engine_path):
+    # Each worker process owns one engine; both sides' settings are applied per search
+    # A worker that cannot start its engine reports every game as unfinished instead of
+    # raising here, which would make the pool respawn it forever
+    global _engine
+    try:
+        _engine = ChessEngine(engine_path).popen()
+    except Exception as e:
+        print(f"Failed to start engine: {e}")
+        return
+    multiprocessing.util.Finalize(None, _engine.quit, exitpriority=10)
+
+def play_game(job):
+    index, fen, white, black, max_plies = job
+    if _engine is None:
+        return {'index': index, 'fen': fen, 'moves': [], 'san': [], 'result': '*',
+                'termination': 'engine failure', 'seconds': 0.0}
+    game = ChessGame(player_color=None, analysis_cache=False, fen=fen, use_engine=False)
+    game.engine = _engine
+    settings = {'white': white, 'black': black}
+    if white.time_control and black.time_control:
+        game.set_time_control(*white.time_control, black=black.time_control)
+    start = time.perf_counter()
+    termination = None
+    while not game.game_over:
+        if len(game.move_stack) >= max_plies:
+            termination = 'move limit'
+            break
+        side = settings[game.current_turn]
+        game.search_limit, game.engine_options = side.limit, side.options
+        if not game.apply_ai_move(game.get_stockfish_move()):
+            termination = 'engine failure'
+            break
+        game.adjudicate()
+    if game.game_over:
+        result, termination = RESULTS[game.winner], game.termination
+    else:
+        result = '1/2-1/2' if termination == 'move limit' else '*'
+    return {
+        'index':        index,
+        'fen':          fen,
+        'moves':        [to_chess_move(undo[0]) for undo in game.move_stack],
+        'san':          game.move_log,
+        'result':       result,
+        'termination':  termination,
+        'seconds':      time.perf_counter() - start,
+    }
+
+def pgn_headers(record, white, black, event):
+    return {
+        'Event':        event,
+        'Site':         "?",
+        'Date':         "????.??.??",
+        'Round':        str(record['index'] + 1),
+        'White':        str(white),
+        'Black':        str(black),
+        'Termination':  pgn_termination(record['termination']),
+    }
+
+def elo_difference(wins, draws, losses):
+    # Elo difference of the first engine with a 95% confidence margin, from the
+    # per-game score variance
+    games = wins + draws + losses
+    if not games:
+        return 0.0, float('inf')
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def elo(p):
+        if p <= 0 or p >= 1:
+            return math.copysign(float('inf'), p - 0.5)
+        return 400 * math.log10(p / (1 - p))
+
+    if score in (0, 1):
+        return elo(score), float('inf')
+    return elo(score), (elo(min(score + margin, 1)) - elo(max(score - margin, 0))) / 2
+
+def run_match(engine_a, engine_b, games, fen=STARTING_FEN, workers=None, engine_path=None, pgn_file=None,
+              max_plies=400, event="Chess2D self-play", progress=None):
+    # Engines swap colours every game; the returned counts are from engine A's point of view
+    jobs = [(i, fen, engine_a, engine_b, max_plies) if i % 2 == 0 else (i, fen, engine_b, engine_a, max_plies)
+            for i in range(games)]
+    workers = max(1, min(workers or os.cpu_count() or 1, games))
+    stats = {'wins': 0, 'draws': 0, 'losses': 0, 'unfinished': 0}
+    writer = PgnWriter(pgn_file, buffer_games=50) if pgn_file else None
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(engine_path,)) as pool:
+        for record in pool.imap_unordered(play_game, jobs):
+            a_is_white = record['index'] % 2 == 0
+            white, black = (engine_a, engine_b) if a_is_white else (engine_b, engine_a)
+            if record['result'] == '*':
+                stats['unfinished'] += 1
+            elif record['result'] == '1/2-1/2':
+                stats['draws'] += 1
+            elif (record['result'] == '1-0') == a_is_white:
+                stats['wins'] += 1
+            else:
+                stats['losses'] += 1
+            if writer:
+                writer.write_moves(record['san'], pgn_headers(record, white, black, event), record['result'],
+                                   record['fen'], record['termination'])
+            if progress:
+                progress(record, stats)
+        pool.close()
+        pool.join()
+    if writer:
+        writer.close()
+    stats['seconds'] = time.perf_counter() - start
+    stats['elo'], stats['elo_margin'] = elo_difference(stats['wins'], stats['draws'], stats['losses'])
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine games without a display.")
+    parser.add_argument("-n", "--games", type=int, default=10, help="number of games (default 10)")
+    parser.add_argument("-a", "--engine-a", default="time=0.1",
+                        help="settings for engine A, e.g. time=0.1,depth=12,nodes=20000,skill=10 or tc=60+0.5")
+    parser.add_argument("-b", "--engine-b", default="time=0.1", help="settings for engine B")
+    parser.add_argument("--fen", default=STARTING_FEN, help="start position for every game")
+    parser.add_argument("--pgn", help="write the games to this PGN file")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--engine", help="path to the UCI engine (default: bundled Stockfish)")
+    parser.add_argument("--max-plies", type=int, default=400, help="adjudicate a draw after this many plies")
+    args = parser.parse_args(argv)
+
+    engine_a, engine_b = EngineSettings(args.engine_a), EngineSettings(args.engine_b)
+
+    def progress(record, stats):
+        print(f"game {record['index'] + 1:>4}: {record['result']:<7} {record['termination']:<22} "
+              f"{len(record['moves']):>3} plies  {record['seconds']:6.1f} s   "
+              f"+{stats['wins']} ={stats['draws']} -{stats['losses']}")
+
+    pgn_file = open(args.pgn, "w") if args.pgn else None
+    try:
+        stats = run_match(engine_a, engine_b, args.games, fen=args.fen, workers=args.workers,
+                          engine_path=args.engine, pgn_file=pgn_file, max_plies=args.max_plies, progress=progress)
+    finally:
+        if pgn_file:
+            pgn_file.close()
+        shutdown_engines()
+
+    played = stats['wins'] + stats['draws'] + stats['losses']
+    print(f"\nA ({engine_a}) vs B ({engine_b})")
+    print(f"W/D/L: {stats['wins']}/{stats['draws']}/{stats['losses']}"
+          + (f"  ({stats['unfinished']} unfinished)" if stats['unfinished'] else ""))
+    print(f"Elo difference: {stats['elo']:+.1f} +/- {stats['elo_margin']:.1f}")
+    print(f"{played} games in {stats['seconds']:.1f} s, {played / max(stats['seconds'], 1e-9):.2f} games/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
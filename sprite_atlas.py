@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        sprite_atlas.py
+#? Purpose:     Process-wide piece sprite atlas, rasterized once per size and theme
+#?              and cached on disk
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import hashlib
+import os
+import threading
+import pygame
+#? -------------------------------------------------------------------------------
+ATLAS_DIR_ENV   = "CHESS2D_ATLAS_DIR"
+PIECE_TYPES     = ['pawn', 'knight', 'bishop', 'rook', 'queen', 'king']
+# Only the pieces the game draws, named like the files in pieces/ (e.g. knight-w.svg)
+SPRITE_NAMES    = [f"{piece_type}-{color}" for color in 'wb' for piece_type in PIECE_TYPES]
+EXTENSIONS      = ('.svg', '.png')
+
+def default_cache_dir():
+    return os.environ.get(ATLAS_DIR_ENV) or os.path.join(os.path.expanduser("~"), ".cache", "chess2d")
+
+class SpriteAtlas:
+    def __init__(self, piece_dir, size, cache_dir=None):
+        self.piece_dir      = piece_dir
+        self.size           = size
+        self.theme          = os.path.basename(os.path.normpath(piece_dir))
+        self.cache_dir      = cache_dir
+        self.sprites        = {}
+        self.load()
+
+    def sources(self):
+        sources = {}
+        for name in SPRITE_NAMES:
+            for extension in EXTENSIONS:
+                path = os.path.join(self.piece_dir, name + extension)
+                if os.path.exists(path):
+                    sources[name] = path
+                    break
+        return sources
+
+    def cache_path(self, sources):
+        # Keyed by theme and size, plus the source files so edited pieces are re-rasterized
+        digest = hashlib.sha1()
+        for name in sorted(sources):
+            stat = os.stat(sources[name])
+            digest.update(f"{name}:{os.path.basename(sources[name])}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return os.path.join(self.cache_dir, f"atlas-{self.theme}-{self.size}px-{digest.hexdigest()[:12]}.png")
+
+    def load(self):
+        sources = self.sources()
+        path = self.cache_path(sources) if self.cache_dir and sources else None
+        if path and os.path.exists(path):
+            try:
+                self.sprites = self.split(pygame.image.load(path), list(sources))
+                return
+            except Exception as e:
+                print(f"Couldn't read piece atlas {path}: {e}")
+        for name, source in sources.items():
+            try:
+                self.sprites[name] = self.rasterize(source)
+            except Exception as e:
+                print(f"Couldn't load piece {os.path.basename(source)}: {e}")
+        if path and len(self.sprites) == len(sources):
+            self.save(path, list(sources))
+
+    def rasterize(self, path):
+        size = (self.size, self.size)
+        # Render vector pieces directly at the target size where pygame supports it
+        if path.endswith('.svg') and hasattr(pygame.image, 'load_sized_svg'):
+            image = pygame.image.load_sized_svg(path, size)
+        else:
+            image = pygame.image.load(path)
+        if image.get_size() != size:
+            if image.get_bitsize() < 24:
+                image = image.convert(32, pygame.SRCALPHA)
+            image = pygame.transform.smoothscale(image, size)
+        return self.convert(image)
+
+    def convert(self, image):
+        # Match the display format for fast blits once a window exists
+        return image.convert_alpha() if pygame.display.get_surface() else image
+
+    def split(self, sheet, names):
+        sheet = self.convert(sheet)
+        if sheet.get_size() != (self.size * len(names), self.size):
+            raise ValueError("atlas size does not match")
+        return {name: sheet.subsurface((i * self.size, 0, self.size, self.size)).copy()
+                for i, name in enumerate(names)}
+
+    def save(self, path, names):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            sheet = pygame.Surface((self.size * len(names), self.size), pygame.SRCALPHA)
+            for i, name in enumerate(names):
+                sheet.blit(self.sprites[name], (i * self.size, 0))
+            # Write under a temporary name so a concurrent reader never sees half a file
+            temp_path = f"{path}.{os.getpid()}.png"
+            pygame.image.save(sheet, temp_path)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Couldn't cache piece atlas: {e}")
+
+_atlases        = {}
+_atlases_lock   = threading.Lock()
+
+def get_atlas(piece_dir, size, cache_dir=None):
+    # One atlas per piece set and size for the whole process; New Game reuses it
+    key = (os.path.abspath(piece_dir), size)
+    with _atlases_lock:
+        atlas = _atlases.get(key)
+        if atlas is None:
+            atlas = _atlases[key] = SpriteAtlas(piece_dir, size, cache_dir or default_cache_dir())
+        return atlas
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# coding=utf-8
+#? -------------------------------------------------------------------------------
+#? Name:        tablebase.py
+#? Purpose:     Syzygy endgame tablebase probing for exact endgame moves and results
+#?
+#? Author:      Mohamed Gueni (mohamedgueni@outlook.com)
+#? Licence:     Refer to the LICENSE file
+#? -------------------------------------------------------------------------------
+import os
+import threading
+import chess
+import chess.syzygy
+#? -------------------------------------------------------------------------------
+SYZYGY_PATH_ENV = "CHESS2D_SYZYGY"
+
+class Tablebase:
+    # Tables are opened lazily by python-chess and probing is thread-safe, so one instance
+    # serves every game in the process
+    def __init__(self, paths):
+        if isinstance(paths, str):
+            paths = [path for path in paths.split(os.pathsep) if path]
+        self.paths          = paths
+        self.hits           = 0
+        self._tables        = chess.syzygy.Tablebase()
+        for path in paths:
+            self._tables.add_directory(path)
+        # Table names are like KRPvKR, so the piece count is the name length minus the 'v'
+        self.max_pieces     = max((len(name) - 1 for name in self._tables.wdl), default=0)
+
+    def covers(self, board):
+        return (not board.castling_rights and
+                chess.popcount(board.occupied) <= self.max_pieces)
+
+    def probe_wdl(self, board):
+        # 2 win, 1 win spoiled by the fifty-move rule, 0 draw, -1 / -2 likewise for a loss,
+        # all for the side to move; None when the position is not in the tables
+        if not self.covers(board):
+            return None
+        try:
+            wdl = self._tables.probe_wdl(board)
+        except (KeyError, chess.syzygy.MissingTableError):
+            return None
+        self.hits += 1
+        return wdl
+
+    def probe_dtz(self, board):
+        if not self.covers(board):
+            return None
+        try:
+            return self._tables.probe_dtz(board)
+        except (KeyError, chess.syzygy.MissingTableError):
+            return None
+
+    def best_move(self, board):
+        # The move that keeps the best result: the fastest way to a win (mate, then captures
+        # and pawn moves that reset the fifty-move count, then the shortest DTZ), the longest
+        # resistance when lost, and any drawing move otherwise
+        if not self.covers(board):
+            return None
+        best = None
+        best_key = None
+        for move in board.legal_moves:
+            zeroing = board.is_zeroing(move)
+            board.push(move)
+            try:
+                if board.is_checkmate():
+                    key = (3, 1, 0)
+                else:
+                    wdl = self.probe_wdl(board)
+                    dtz = self.probe_dtz(board)
+                    if wdl is None or dtz is None:
+                        return None
+                    # wdl and dtz are from the opponent's side after the move
+                    if wdl < 0:
+                        key = (-wdl, zeroing, dtz)
+                    elif wdl > 0:
+                        key = (-wdl, 0, dtz)
+                    else:
+                        key = (0, zeroing, 0)
+            finally:
+                board.pop()
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best
+
+    def close(self):
+        self._tables.close()
+
+_default_tablebase = None
+_default_tablebase_lock = threading.Lock()
+
+def default_tablebase():
+    # Process-wide tablebase from CHESS2D_SYZYGY (directories separated like PATH), or None
+    global _default_tablebase
+    with _default_tablebase_lock:
+        if _default_tablebase is None:
+            _default_tablebase = False
+            paths = os.environ.get(SYZYGY_PATH_ENV)
+            if paths:
+                try:
+                    tablebase = Tablebase(paths)
+                    if tablebase.max_pieces:
+                        _default_tablebase = tablebase
+                    else:
+                        print(f"No Syzygy tables found in {paths}")
+                except OSError as e:
+                    print(f"Couldn't open Syzygy tables {paths}: {e}")
+        return _default_tablebase or None